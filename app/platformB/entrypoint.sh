@@ -1,4 +1,4 @@
 #!/bin/bash
 python manage.py migrate --no-input
 python manage.py collectstatic --no-input
-gunicorn djangotutorial.wsgi:application -b 0.0.0.0:8000 --workers 3 --threads 3
\ No newline at end of file
+exec gunicorn -c gunicorn.conf.py
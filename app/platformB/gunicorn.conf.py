@@ -0,0 +1,57 @@
+# Настройки gunicorn. Все значения можно переопределить переменными окружения.
+#
+# Замер: docker compose up, затем из контейнера web
+#   python manage.py loadtest http://nginx/api/v1/products/list/ --token <access> --concurrency 200 --duration 60
+# Сравнивать с прежним запуском (--workers 3 --threads 3 без keep-alive к nginx) при тех же параметрах.
+import os
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _flag(name, default):
+    return os.getenv(name, default) in ('1', 'True')
+
+
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2 * _cpu_count() + 1))
+
+if server_mode == 'asgi':
+    wsgi_app = 'platformB.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'platformB.wsgi:application'
+    threads = int(os.getenv('GUNICORN_THREADS', 3))
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Приложение загружается в мастере до fork, воркеры делят память через copy-on-write
+preload_app = _flag('GUNICORN_PRELOAD', 'True')
+
+# Перезапуск воркеров ограничивает рост памяти; jitter не даёт им перезапуститься одновременно
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Должен быть больше keepalive_timeout в upstream nginx, иначе nginx получит закрытое соединение
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+backlog = int(os.getenv('GUNICORN_BACKLOG', 2048))
+
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = '-' if _flag('GUNICORN_ACCESS_LOG', 'False') else None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Соединения, открытые в мастере при preload, нельзя делить между процессами
+    from django.conf import settings
+    if settings.configured:
+        from django.db import connections
+        connections.close_all()
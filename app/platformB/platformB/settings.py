@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
 from pathlib import Path
 from datetime import timedelta
 import os
@@ -46,12 +47,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'project.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'project.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'platformB.urls'
@@ -76,17 +79,91 @@ WSGI_APPLICATION = 'platformB.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# wsgi - gunicorn с потоками, asgi - gunicorn с воркерами uvicorn и асинхронными представлениями чтения
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+# Пул psycopg 3 (нужен пакет psycopg[pool]) несовместим с CONN_MAX_AGE > 0.
+# Под ASGI соединения привязаны к потоку запроса, поэтому постоянные соединения там выключены - используйте пул.
+DB_POOL = os.getenv('DB_POOL', 'False') in ('1', 'True')
+# Пустое значение (так его передаёт docker-compose, если переменная не задана) - значение по умолчанию для режима
+DB_CONN_MAX_AGE = 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE') or (0 if SERVER_MODE == 'asgi' else 60))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('DB_NAME', 'default_db_name'),
         'USER': os.getenv('DB_USER', 'myprojectuser'),
         'PASSWORD': os.getenv('DB_PASS', 'password'),
         'HOST': os.getenv('DB_HOST', '127.0.0.1'),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') in ('1', 'True'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Реплики для чтения, остальные параметры берутся из default:
+# DB_REPLICA_HOSTS=host1,host2:5433 - отдельные серверы;
+# DB_REPLICA_NAMES=replica.sqlite3 - другие базы на том же сервере, например файлы SQLite для локальной проверки
+replica_overrides = []
+for replica in filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')):
+    host, _, port = replica.strip().partition(':')
+    replica_overrides.append({'HOST': host, 'PORT': port or DATABASES['default']['PORT']})
+for name in filter(None, os.getenv('DB_REPLICA_NAMES', '').split(',')):
+    replica_overrides.append({'NAME': name.strip()})
+
+REPLICA_DATABASES = []
+for number, overrides in enumerate(replica_overrides, start=1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **copy.deepcopy(DATABASES['default']),
+        **overrides,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['project.routers.ReplicaRouter']
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+LOCMEM_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', LOCMEM_CACHE_BACKEND)
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '')
+CACHE_OPTIONS = {} if 'redis' in CACHE_BACKEND else {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))}
+
+# Кэш списков должен быть общим для воркеров: LocMem сбрасывается только в воркере, который обработал запись,
+# остальные отдают устаревшие списки до API_CACHE_TIMEOUT. Без общего кэша списки не кэшируются.
+API_CACHE_BACKEND = os.getenv(
+    'API_CACHE_BACKEND',
+    'django.core.cache.backends.dummy.DummyCache' if CACHE_BACKEND == LOCMEM_CACHE_BACKEND else CACHE_BACKEND
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': CACHE_OPTIONS,
+        'KEY_PREFIX': 'default',
+    },
+    'api': {
+        'BACKEND': API_CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': CACHE_OPTIONS if API_CACHE_BACKEND == CACHE_BACKEND else {},
+        'KEY_PREFIX': 'api',
+    },
+}
+
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -126,13 +203,29 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+API_JSON_BACKEND = os.getenv('API_JSON_BACKEND', 'orjson')
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', str(SERVER_MODE == 'asgi')) in ('1', 'True')
+
+# Пользователь и компания берутся из токена без запроса к базе, отзыв хранится в кэше default
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', 'False') in ('1', 'True')
+
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'project.pagination.KeysetPagination',
     'PAGE_SIZE': 5,
-    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',),
+    'DEFAULT_RENDERER_CLASSES': (
+        'project.renderers.ORJSONRenderer' if API_JSON_BACKEND == 'orjson' else 'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'project.renderers.ORJSONParser' if API_JSON_BACKEND == 'orjson' else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'project.authentication.TenantStatelessJWTAuthentication'
+        if JWT_STATELESS_AUTH
+        else 'project.authentication.TenantJWTAuthentication',
     ]
 }
 
@@ -168,8 +261,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=60),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializer.CompanyTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializer.CompanyTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
@@ -196,3 +289,16 @@ SPECTACULAR_SETTINGS = {
 }
 
 STATIC_ROOT = BASE_DIR / 'static'
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+IMPORT_MAX_CHUNK_SIZE = int(os.getenv('IMPORT_MAX_CHUNK_SIZE', 5000))
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+PRODUCT_BATCH_MAX_ITEMS = int(os.getenv('PRODUCT_BATCH_MAX_ITEMS', 5000))
+
+# streaming — приложение сжимает только потоковые ответы, остальные сжимает nginx; all — все ответы; off
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'streaming')
+RESPONSE_COMPRESSION_MIN_LENGTH = int(os.getenv('RESPONSE_COMPRESSION_MIN_LENGTH', 1024))
+# br и zstd используются, если установлены пакеты brotli и zstandard
+RESPONSE_COMPRESSION_ENCODINGS = os.getenv('RESPONSE_COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',')
+RESPONSE_COMPRESSION_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
@@ -0,0 +1,65 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Func, Sum, Window
+from django.db.models.functions import Rank, Trunc
+from django.utils import timezone
+
+from .models import ProductSale
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class RunningTotal(Func):
+    function = 'SUM'
+    window_compatible = True
+
+
+def _line_metrics():
+    revenue = ExpressionWrapper(F('quantity') * F('product__sale_price'), output_field=MONEY)
+    profit = ExpressionWrapper(
+        F('quantity') * (F('product__sale_price') - F('product__purchase_price')),
+        output_field=MONEY
+    )
+    return {
+        'units': Sum('quantity'),
+        'revenue': Sum(revenue),
+        'profit': Sum(profit),
+    }
+
+
+def _day_start(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def sales_analytics(company_id, bucket, top, start_date=None, end_date=None):
+    lines = ProductSale.objects.filter(sale__company_id=company_id)
+    if start_date:
+        lines = lines.filter(sale__sale_date__gte=_day_start(start_date))
+    if end_date:
+        lines = lines.filter(sale__sale_date__lt=_day_start(end_date + timedelta(days=1)))
+
+    metrics = _line_metrics()
+
+    totals = lines.aggregate(**metrics)
+
+    series = lines.annotate(
+        period=Trunc('sale__sale_date', bucket)
+    ).values('period').annotate(**metrics).annotate(
+        cumulative_revenue=Window(
+            RunningTotal(_line_metrics()['revenue'], output_field=MONEY),
+            order_by=F('period').asc()
+        )
+    ).order_by('period')
+
+    top_products = lines.values('product_id', 'product__title').annotate(**metrics).annotate(
+        rank=Window(Rank(), order_by=_line_metrics()['revenue'].desc())
+    ).order_by('rank', 'product_id')[:top]
+
+    return {
+        'bucket': bucket,
+        'start_date': start_date,
+        'end_date': end_date,
+        'totals': totals,
+        'series': list(series),
+        'top_products': list(top_products),
+    }
@@ -0,0 +1,187 @@
+import inspect
+
+from asgiref.sync import sync_to_async
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Company, Storage, Supplier, Product, Supply, Sale
+from .serializer import CompanySerializer, StorageDetailSerializer
+from .permissions import IsRelatedToCompany
+from .representations import CompanyValuesSerializer, StorageValuesSerializer, SupplierValuesSerializer, \
+    ProductValuesSerializer, SupplyValuesSerializer, SaleValuesSerializer, FIELDSET_PARAMETERS
+from .pagination import KeysetPagination, SupplyPagination, SalePagination
+from .filters import FILTER_BACKENDS, ProductFilter, SaleFilter, filter_queryset
+from .tenant import get_tenant
+from .cache import acache_company_response, get_not_modified_response, set_version_headers
+
+
+class AsyncAPIView(APIView):
+    # APIView.dispatch синхронный: аутентификацию и права проверяем в потоке, обработчик выполняем в event loop
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncCompanyRetrieveAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        tags=['company'],
+        description="Получение компании по ID. Доступно всем авторизованным пользователям.",
+        request=CompanySerializer,
+        parameters=FIELDSET_PARAMETERS
+    )
+    async def get(self, request, pk):
+        fieldset = CompanyValuesSerializer.get_fieldset(request)
+
+        updated_at = await Company.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+        if updated_at is None:
+            return Response({"detail": "Компания не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = await CompanyValuesSerializer.aretrieve(
+            Company.objects.filter(pk=pk), fieldset, extra=['updated_at']
+        )
+        if row is None:
+            return Response({"detail": "Компания не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
+
+
+class AsyncStorageRetrieveAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+
+    @extend_schema(
+        tags=['storage'],
+        description="Получение склада по ID. Доступно пользователям, связанным с компанией склада.",
+        request=StorageDetailSerializer,
+        parameters=FIELDSET_PARAMETERS
+    )
+    async def get(self, request, pk):
+        fieldset = StorageValuesSerializer.get_fieldset(request)
+
+        try:
+            company_id, updated_at = await Storage.objects.values_list('company_id', 'updated_at').aget(pk=pk)
+        except Storage.DoesNotExist:
+            return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        if company_id != get_tenant(request).company_id:
+            return Response({
+                "detail": "У вас нет доступа к этому складу"
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = await StorageValuesSerializer.aretrieve(
+            Storage.objects.filter(pk=pk), fieldset, extra=['updated_at']
+        )
+        if row is None:
+            return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
+
+
+class AsyncSupplierListAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = KeysetPagination
+
+    @extend_schema(
+        tags=['supplier'],
+        description="Получение списка поставщиков компании",
+        parameters=FIELDSET_PARAMETERS
+    )
+    @acache_company_response
+    async def get(self, request):
+        suppliers = Supplier.objects.filter(company_id=get_tenant(request).company_id)
+
+        return await self.pagination_class().apaginate_values(SupplierValuesSerializer, suppliers, request, view=self)
+
+
+class AsyncProductListAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = KeysetPagination
+    filter_backends = FILTER_BACKENDS
+    filterset_class = ProductFilter
+    ordering_fields = ['id', 'title', 'sale_price']
+
+    @extend_schema(
+        tags=['product'],
+        description="Получение списка продуктов компании. "
+                    "Фильтры: title__icontains, title__istartswith, purchase_price__gte/lte, sale_price__gte/lte, "
+                    "quantity__lte; сортировка ordering=id|title|sale_price (с минусом — по убыванию)",
+        parameters=FIELDSET_PARAMETERS
+    )
+    @acache_company_response
+    async def get(self, request):
+        storage_id = await get_tenant(request).aget_storage_id()
+        if storage_id is None:
+            return Response({"detail": "У вашей компании ещё нет склада"}, status=status.HTTP_404_NOT_FOUND)
+
+        products = filter_queryset(request, Product.objects.filter(storage_id=storage_id), self)
+
+        return await self.pagination_class().apaginate_values(ProductValuesSerializer, products, request, view=self)
+
+
+class AsyncSupplyListAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = SupplyPagination
+
+    @extend_schema(
+        tags=['supply'],
+        description="Получение списка поставок компании",
+        parameters=FIELDSET_PARAMETERS
+    )
+    @acache_company_response
+    async def get(self, request):
+        supplies = Supply.objects.filter(supplier__company_id=get_tenant(request).company_id)
+
+        return await self.pagination_class().apaginate_values(SupplyValuesSerializer, supplies, request, view=self)
+
+
+class AsyncSaleListAPIView(AsyncAPIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = SalePagination
+    filter_backends = FILTER_BACKENDS
+    filterset_class = SaleFilter
+    ordering_fields = ['sale_date', 'id']
+
+    @extend_schema(
+        tags=['sales'],
+        description="Получение списка продаж. "
+                    "Фильтры: buyer_name__icontains, buyer_name__istartswith, product, start_date, end_date; "
+                    "сортировка ordering=sale_date|id (с минусом — по убыванию)",
+        parameters=FIELDSET_PARAMETERS
+    )
+    async def get(self, request):
+        queryset = filter_queryset(request, Sale.objects.filter(company_id=get_tenant(request).company_id), self)
+
+        return await self.pagination_class().apaginate_values(SaleValuesSerializer, queryset, request, view=self)
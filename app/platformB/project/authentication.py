@@ -0,0 +1,89 @@
+import time
+
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Company
+
+TENANT_CLAIMS_ISSUED_AT = 'tenant_iat'
+TENANT_CLAIMS = ('company_id', 'is_company_owner', TENANT_CLAIMS_ISSUED_AT)
+
+
+def _revocation_key(user_id):
+    return f'tenant-claims-revoked:{user_id}'
+
+
+def set_tenant_claims(token, user):
+    token['company_id'] = user.company_id
+    token['is_company_owner'] = user.is_company_owner
+    token[TENANT_CLAIMS_ISSUED_AT] = time.time()
+    return token
+
+
+def invalidate_tenant_claims(*user_ids):
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    revoked_at = time.time()
+    cache.set_many({_revocation_key(user_id): revoked_at for user_id in user_ids}, timeout)
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # JWTAuthentication.get_user с одним отличием: пользователь загружается вместе с компанией и складом
+        # одним запросом. Проверки simplejwt (активность, отзыв после смены пароля) повторены без изменений.
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = self.user_model.objects.select_related('company__storage').get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class TenantTokenUser(TokenUser):
+    @cached_property
+    def company_id(self):
+        return self.token.get('company_id')
+
+    @cached_property
+    def is_company_owner(self):
+        return self.token.get('is_company_owner', False)
+
+    @cached_property
+    def company(self):
+        if self.company_id is None:
+            return None
+        return Company.objects.select_related('storage').filter(pk=self.company_id).first()
+
+
+class TenantStatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if any(claim not in validated_token for claim in TENANT_CLAIMS):
+            raise InvalidToken(_("Token contained no tenant claims"))
+
+        revoked_at = cache.get(_revocation_key(validated_token[api_settings.USER_ID_CLAIM]))
+        if revoked_at is not None and validated_token[TENANT_CLAIMS_ISSUED_AT] < revoked_at:
+            raise InvalidToken(_("Token tenant claims are outdated"))
+
+        return TenantTokenUser(validated_token)
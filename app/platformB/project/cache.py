@@ -0,0 +1,180 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+from .routers import use_primary
+from .tenant import get_tenant
+
+
+def get_api_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _version_key(company_id):
+    return f'api:{company_id}:version'
+
+
+def _written_key(company_id):
+    return f'api:{company_id}:written'
+
+
+def get_company_version(company_id):
+    cache = get_api_cache()
+    version = cache.get(_version_key(company_id))
+    if version is None:
+        cache.add(_version_key(company_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(company_id))
+    return version
+
+
+async def aget_company_version(company_id):
+    cache = get_api_cache()
+    version = await cache.aget(_version_key(company_id))
+    if version is None:
+        await cache.aadd(_version_key(company_id), uuid.uuid4().hex, None)
+        version = await cache.aget(_version_key(company_id))
+    return version
+
+
+def _bump_company_version(company_id):
+    cache = get_api_cache()
+    cache.set(_version_key(company_id), uuid.uuid4().hex, None)
+    # Пока реплика может отставать, новую запись кэша собираем из основной базы
+    cache.set(_written_key(company_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def invalidate_company_cache(company_id):
+    # Внутри транзакции сбрасываем кэш после commit, иначе его успеют заполнить старыми данными
+    if company_id is not None:
+        transaction.on_commit(lambda: _bump_company_version(company_id))
+
+
+def _request_digest(request):
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    return hashlib.md5(f'{request.get_host()}:{request.accepted_media_type}:{params}'.encode()).hexdigest()
+
+
+def build_cache_key(request, scope, company_id):
+    return f'api:{company_id}:{get_company_version(company_id)}:{scope}:{_request_digest(request)}'
+
+
+async def abuild_cache_key(request, scope, company_id):
+    return f'api:{company_id}:{await aget_company_version(company_id)}:{scope}:{_request_digest(request)}'
+
+
+def _finalize(response, etag):
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization',))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # nginx gzip и CompressionMiddleware отдают ETag как W/"...", поэтому сравниваем слабо
+    return etag in (tag.removeprefix('W/') for tag in parse_etags(if_none_match))
+
+
+def _render_entry(view, request, response):
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = view.get_renderer_context()
+    response.render()
+
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': f'"{hashlib.md5(response.content).hexdigest()}"',
+    }
+
+
+def _cached_response(request, entry, response=None):
+    if response is None:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    if _not_modified(request, entry['etag']):
+        response = HttpResponseNotModified()
+    return _finalize(response, entry['etag'])
+
+
+def cache_company_response(view_method):
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        company_id = get_tenant(request).company_id
+        if company_id is None:
+            return view_method(self, request, *args, **kwargs)
+
+        cache = get_api_cache()
+        key = build_cache_key(request, self.__class__.__name__, company_id)
+        entry = cache.get(key)
+        response = None
+
+        if entry is None:
+            if cache.get(_written_key(company_id)):
+                use_primary()
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = _render_entry(self, request, response)
+            cache.set(key, entry, settings.API_CACHE_TIMEOUT)
+
+        return _cached_response(request, entry, response)
+
+    return wrapper
+
+
+def acache_company_response(view_method):
+    @wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        company_id = get_tenant(request).company_id
+        if company_id is None:
+            return await view_method(self, request, *args, **kwargs)
+
+        cache = get_api_cache()
+        key = await abuild_cache_key(request, self.__class__.__name__, company_id)
+        entry = await cache.aget(key)
+        response = None
+
+        if entry is None:
+            if await cache.aget(_written_key(company_id)):
+                use_primary()
+            response = await view_method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = _render_entry(self, request, response)
+            await cache.aset(key, entry, settings.API_CACHE_TIMEOUT)
+
+        return _cached_response(request, entry, response)
+
+    return wrapper
+
+
+def version_etag(pk, updated_at, fieldset):
+    etag = f'{pk}-{int(updated_at.timestamp() * 1_000_000)}'
+    # Ответ с ?fields=/?expand= - другое представление той же версии, у него свой ETag
+    if fieldset is not None:
+        etag += '-' + hashlib.md5(','.join(sorted(fieldset)).encode()).hexdigest()
+    return f'"{etag}"'
+
+
+def get_not_modified_response(request, pk, updated_at, fieldset):
+    etag = version_etag(pk, updated_at, fieldset)
+    response = get_conditional_response(request, etag=etag, last_modified=int(updated_at.timestamp()))
+    if response is not None:
+        return _finalize(response, etag)
+    return None
+
+
+def set_version_headers(response, pk, updated_at, fieldset):
+    response['Last-Modified'] = http_date(updated_at.timestamp())
+    return _finalize(response, version_etag(pk, updated_at, fieldset))
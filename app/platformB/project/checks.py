@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Эти кэши живут внутри процесса: воркеры gunicorn не видят записи друг друга
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_per_process_cache(alias):
+    return settings.CACHES[alias]['BACKEND'] in PER_PROCESS_CACHE_BACKENDS
+
+
+@register(Tags.caches)
+def check_revocation_cache(app_configs, **kwargs):
+    if not settings.JWT_STATELESS_AUTH or not is_per_process_cache('default'):
+        return []
+    return [Error(
+        "JWT_STATELESS_AUTH хранит отзыв токенов в кэше default, а он не общий для воркеров",
+        hint="Укажите общий кэш, например CACHE_BACKEND=django.core.cache.backends.redis.RedisCache "
+             "и CACHE_LOCATION=redis://redis:6379/1",
+        id='project.E001',
+    )]
+
+
+@register(Tags.caches)
+def check_api_cache(app_configs, **kwargs):
+    if settings.DEBUG or settings.CACHES[settings.API_CACHE_ALIAS]['BACKEND'] != settings.LOCMEM_CACHE_BACKEND:
+        return []
+    return [Error(
+        "Кэш списков в LocMem: после записи остальные воркеры отдают устаревшие данные",
+        hint="Укажите общий кэш через CACHE_BACKEND/CACHE_LOCATION или уберите API_CACHE_BACKEND, "
+             "чтобы списки не кэшировались",
+        id='project.E002',
+    )]
+
+
+@register(Tags.caches, Tags.database)
+def check_replica_stickiness_cache(app_configs, **kwargs):
+    if settings.DEBUG or not settings.REPLICA_DATABASES or not is_per_process_cache('default'):
+        return []
+    return [Error(
+        "Привязка к основной базе после записи хранится в кэше default, а он не общий для воркеров: "
+        "следующий запрос клиента может прочитать отстающую реплику",
+        hint="Укажите общий кэш через CACHE_BACKEND/CACHE_LOCATION",
+        id='project.E003',
+    )]
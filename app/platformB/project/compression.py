@@ -0,0 +1,129 @@
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Уровни для ответов, которые сжимаются на лету: выигрыш от максимальных уровней не окупает время CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+# Общий интерфейс: compress - очередная порция, flush - отдать всё накопленное, не завершая поток
+# (иначе потоковый ответ держится в буфере компрессора), finish - завершить поток
+class _GzipCompressor:
+    def __init__(self):
+        self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self):
+        self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+COMPRESSORS = {
+    'gzip': _GzipCompressor,
+}
+if brotli is not None:
+    COMPRESSORS['br'] = _BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _ZstdCompressor
+
+
+def get_encodings():
+    # Порядок в настройке — предпочтение сервера при одинаковом q у клиента
+    return [encoding for encoding in settings.RESPONSE_COMPRESSION_ENCODINGS if encoding in COMPRESSORS]
+
+
+def parse_accept_encoding(header):
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def negotiate_encoding(header, encodings=None):
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings if encodings is not None else get_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_chunks(chunks, encoding):
+    # Каждую порцию отдаём сразу: отчёт импорта и выгрузка должны доходить до клиента по мере готовности
+    compressor = COMPRESSORS[encoding]()
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+async def acompress_chunks(chunks, encoding):
+    compressor = COMPRESSORS[encoding]()
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush()
+    yield compressor.finish()
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializer import SaleSerializer, SupplySerializer
+
+BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class BaseExporter:
+    serializer_class = None
+    csv_header = ()
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def __init__(self, queryset, chunk_size):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    def objects(self):
+        queryset = self.serializer_class.setup_eager_loading(self.queryset)
+        for instance in queryset.iterator(chunk_size=self.chunk_size):
+            yield self.serializer_class(instance).data
+
+    def ndjson(self):
+        for data in self.objects():
+            yield (json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + '\n').encode()
+
+    def csv(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.csv_header).encode()
+        for data in self.objects():
+            for row in self.csv_rows(data):
+                yield writer.writerow(row).encode()
+
+    def csv_rows(self, data):
+        raise NotImplementedError
+
+    def stream(self, output):
+        return buffered(self.csv() if output == 'csv' else self.ndjson())
+
+
+class SaleExporter(BaseExporter):
+    serializer_class = SaleSerializer
+    csv_header = ('id', 'buyer_name', 'sale_date', 'product_id', 'quantity')
+
+    def csv_rows(self, data):
+        head = (data['id'], data['buyer_name'], data['sale_date'])
+        if not data['product_sales']:
+            return [head + ('', '')]
+        return [head + (line['product_id'], line['quantity']) for line in data['product_sales']]
+
+
+class SupplyExporter(BaseExporter):
+    serializer_class = SupplySerializer
+    csv_header = ('id', 'supplier', 'delivery_date', 'product', 'quantity')
+
+    def csv_rows(self, data):
+        head = (data['id'], data['supplier'], data['delivery_date'])
+        if not data['products']:
+            return [head + ('', '')]
+        return [head + (line['product'], line['quantity']) for line in data['products']]
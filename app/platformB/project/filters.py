@@ -0,0 +1,55 @@
+import django_filters
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
+
+from .models import Product, Sale, ProductSale
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    # Курсор строится по первому полю сортировки, поэтому берём одно поле и добавляем id для устойчивого порядка
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+
+        field = ordering[0]
+        if field.lstrip('-') == 'id':
+            return (field,)
+        return (field, '-id' if field.startswith('-') else 'id')
+
+
+class ProductFilter(django_filters.FilterSet):
+    class Meta:
+        model = Product
+        fields = {
+            'title': ['icontains', 'istartswith'],
+            'purchase_price': ['gte', 'lte'],
+            'sale_price': ['gte', 'lte'],
+            'quantity': ['lte'],
+        }
+
+
+class SaleFilter(django_filters.FilterSet):
+    product = django_filters.NumberFilter(method='filter_product')
+    start_date = django_filters.IsoDateTimeFilter(field_name='sale_date', lookup_expr='gte')
+    end_date = django_filters.IsoDateTimeFilter(field_name='sale_date', lookup_expr='lte')
+
+    class Meta:
+        model = Sale
+        fields = {
+            'buyer_name': ['icontains', 'istartswith'],
+        }
+
+    def filter_product(self, queryset, name, value):
+        # EXISTS вместо JOIN: продажа с несколькими строками одного товара не задваивается
+        return queryset.filter(Exists(ProductSale.objects.filter(sale=OuterRef('pk'), product_id=value)))
+
+
+FILTER_BACKENDS = [DjangoFilterBackend, KeysetOrderingFilter]
+
+
+def filter_queryset(request, queryset, view):
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(request, queryset, view)
+    return queryset
@@ -0,0 +1,107 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .tenant import get_tenant
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_PARAMETER = OpenApiParameter(
+    IDEMPOTENCY_HEADER,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="Повтор запроса с тем же ключом вернёт сохранённый ответ без повторной записи"
+)
+
+
+class _Discard(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class _Duplicate(Exception):
+    pass
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"detail": "Ключ идемпотентности уже использован с другим телом запроса"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(scope):
+    # Ключ записывается в той же транзакции, что и сама операция: параллельный дубль ждёт на уникальном
+    # индексе и после commit первого запроса получает сохранённый ответ. Неуспешные ответы не сохраняются.
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            company_id = get_tenant(request).company_id
+            if not key or company_id is None:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+                return Response(
+                    {"detail": "Слишком длинный ключ идемпотентности"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            fingerprint = _fingerprint(request)
+            lookup = {'company_id': company_id, 'scope': scope, 'key': key}
+
+            record = IdempotencyKey.objects.filter(**lookup).first()
+            if record is not None:
+                if record.expires_at > timezone.now():
+                    return _replay(record, fingerprint)
+                record.delete()
+
+            try:
+                with transaction.atomic():
+                    try:
+                        with transaction.atomic():
+                            record = IdempotencyKey.objects.create(
+                                **lookup,
+                                fingerprint=fingerprint,
+                                expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                            )
+                    except IntegrityError:
+                        raise _Duplicate
+
+                    response = view_method(self, request, *args, **kwargs)
+                    if not status.is_success(response.status_code):
+                        raise _Discard(response)
+
+                    record.status_code = response.status_code
+                    record.response = response.data
+                    record.save(update_fields=['status_code', 'response'])
+            except _Discard as e:
+                return e.response
+            except _Duplicate:
+                record = IdempotencyKey.objects.filter(**lookup).first()
+                if record is None:
+                    return Response(
+                        {"detail": "Запрос с этим ключом идемпотентности ещё выполняется"},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                return _replay(record, fingerprint)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,165 @@
+import codecs
+import csv
+import json
+import logging
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import APIException, ValidationError
+
+from .serializer import SaleSerializer, SupplySerializer, SupplyItemSerializer
+from .cache import invalidate_company_cache
+from .services import book_sale, ingest_supply
+from .tenant import get_tenant
+
+logger = logging.getLogger(__name__)
+
+
+def _lines(stream):
+    return iter(stream.readline, b'')
+
+
+def get_upload_stream(request):
+    if request.stream is not None:
+        return request.stream
+    # Без Content-Length DRF не создаёт stream, а nginx с proxy_request_buffering off передаёт
+    # загрузку chunked. gunicorn декодирует chunked в wsgi.input сам, под ASGI тело уже лежит в request
+    if request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        return request.META.get('wsgi.input') or request._request
+    return None
+
+
+class BaseImporter:
+    header_fields = ()
+    item_key = None
+    item_fields = ()
+
+    def __init__(self, request):
+        self.request = request
+        self.company = get_tenant(request).company
+
+    def read_ndjson(self, stream):
+        for number, line in enumerate(_lines(stream), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, None, {"detail": f"Некорректный JSON: {e}"}
+                continue
+            if not isinstance(record, dict):
+                yield number, None, {"detail": "Запись должна быть JSON-объектом"}
+                continue
+            yield number, record, None
+
+    def read_csv(self, stream):
+        # Строки одного документа идут подряд и имеют одинаковый ref
+        reader = csv.DictReader(codecs.iterdecode(_lines(stream), 'utf-8'))
+        record, ref, number = None, None, None
+
+        try:
+            for row in reader:
+                if record is None or row.get('ref') != ref:
+                    if record is not None:
+                        yield number, record, None
+                    record = {field: row.get(field) for field in self.header_fields}
+                    record[self.item_key] = []
+                    ref, number = row.get('ref'), reader.line_num
+                record[self.item_key].append({field: row.get(field) for field in self.item_fields})
+        except UnicodeDecodeError:
+            # Недочитанный документ не применяем: его строки могли продолжаться в нечитаемой части
+            yield number if record is not None else reader.line_num + 1, None, {
+                "detail": f"Файл должен быть в кодировке UTF-8, разбор остановлен на строке {reader.line_num + 1}"
+            }
+            return
+
+        if record is not None:
+            yield number, record, None
+
+    def read(self, stream, content_type):
+        if content_type.startswith('text/csv'):
+            return self.read_csv(stream)
+        return self.read_ndjson(stream)
+
+    def validate(self, record):
+        raise NotImplementedError
+
+    def apply(self, validated_data):
+        raise NotImplementedError
+
+    def run(self, records, chunk_size):
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield from self.commit(chunk)
+                chunk = []
+        if chunk:
+            yield from self.commit(chunk)
+
+    def commit(self, chunk):
+        results = []
+        with transaction.atomic():
+            for number, record, errors in chunk:
+                if errors is None:
+                    try:
+                        with transaction.atomic():
+                            instance = self.apply(self.validate(record))
+                        results.append({"line": number, "status": "created", "id": instance.id})
+                        continue
+                    except APIException as e:
+                        errors = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+                    except DatabaseError:
+                        # Текст ошибки базы (SQL, имена ограничений) клиенту не отдаём
+                        logger.exception("Ошибка базы при импорте записи %s", number)
+                        errors = {"detail": "Не удалось сохранить запись из-за ошибки базы данных"}
+                results.append({"line": number, "status": "error", "errors": errors})
+
+        invalidate_company_cache(self.company.id)
+
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+
+
+class SaleImporter(BaseImporter):
+    header_fields = ('buyer_name', 'sale_date')
+    item_key = 'product_sales'
+    item_fields = ('product_id', 'quantity')
+
+    def validate(self, record):
+        serializer = SaleSerializer(data=record, context={'request': self.request})
+        serializer.is_valid(raise_exception=True)
+        if not serializer.validated_data.get('product_sales'):
+            raise ValidationError({"detail": "Список товаров не может быть пустым"})
+        return serializer.validated_data
+
+    def apply(self, validated_data):
+        return book_sale(company=self.company, **validated_data)
+
+
+class SupplyImporter(BaseImporter):
+    header_fields = ('supplier', 'delivery_date')
+    item_key = 'products'
+    item_fields = ('product', 'quantity')
+
+    def validate(self, record):
+        serializer = SupplySerializer(data=record)
+        serializer.is_valid(raise_exception=True)
+
+        products = record.get('products')
+        if not products:
+            raise ValidationError({"detail": "Список продуктов не может быть пустым"})
+        if serializer.validated_data['supplier'].company_id != self.company.id:
+            raise ValidationError({"detail": "Поставщик принадлежит другой компании"})
+
+        items = SupplyItemSerializer(data=products, many=True)
+        if not items.is_valid():
+            raise ValidationError({"products": items.errors})
+
+        return {
+            'supplier': serializer.validated_data['supplier'],
+            'delivery_date': serializer.validated_data['delivery_date'],
+            'products': items.validated_data,
+        }
+
+    def apply(self, validated_data):
+        return ingest_supply(company=self.company, **validated_data)
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from project.compression import COMPRESSORS, compress, compress_chunks
+from project.exports import SaleExporter
+from project.models import Product, Supply, Sale
+from project.renderers import ORJSONRenderer
+from project.representations import ProductValuesSerializer, SupplyValuesSerializer, SaleValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет размер и время сжатия реальных ответов API (страницы списков и потоковая выгрузка) "
+        "для доступных кодировок и оценивает выигрыш во времени передачи. "
+        "Данные создаются командой `benchmark_queries --seed`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000], help="Строк на странице")
+        parser.add_argument('--bandwidth', type=float, nargs='+', default=[10, 100], help="Канал клиента, Мбит/с")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not Sale.objects.exists():
+            self.stderr.write("Нет тестовых данных, запустите `benchmark_queries --seed`")
+            return
+
+        self.stdout.write(f"кодировки: {', '.join(COMPRESSORS)}")
+        renderer = ORJSONRenderer()
+        targets = [
+            ('products', Product.objects.order_by('id'), ProductValuesSerializer),
+            ('supplies', Supply.objects.order_by('id'), SupplyValuesSerializer),
+            ('sales', Sale.objects.order_by('id'), SaleValuesSerializer),
+        ]
+
+        for name, queryset, values_serializer in targets:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for size in options['sizes']:
+                rows = values_serializer.to_representation(values_serializer.values(queryset[:size]))
+                payload = renderer.render({'next': None, 'previous': None, 'results': rows})
+                self.report(f"{len(rows)} строк", payload, options)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("sales/export (ndjson, потоково)"))
+        size = options['sizes'][-1]
+        chunks = list(SaleExporter(Sale.objects.order_by('id')[:size], 2000).stream('ndjson'))
+        self.report(f"{size} продаж", chunks, options)
+
+    def report(self, label, payload, options):
+        streamed = isinstance(payload, list)
+        raw_size = sum(map(len, payload)) if streamed else len(payload)
+        self.stdout.write(f"  {label}: {raw_size / 1024:.1f} KiB")
+
+        for encoding in COMPRESSORS:
+            if streamed:
+                build = lambda: sum(map(len, compress_chunks(payload, encoding)))
+            else:
+                build = lambda: len(compress(payload, encoding))
+            elapsed, size = self.measure(options['repeat'], build)
+
+            # Выигрыш = время передачи несжатого ответа - (сжатие + передача сжатого)
+            saved = ', '.join(
+                f"{bandwidth:g} Мбит/с: {((raw_size - size) * 8 / (bandwidth * 1e6) - elapsed) * 1000:+.1f} ms"
+                for bandwidth in options['bandwidth']
+            )
+            self.stdout.write(
+                f"    {encoding:<5} {size / 1024:9.1f} KiB (x{raw_size / size:4.1f}), "
+                f"сжатие {elapsed * 1000:7.2f} ms; выигрыш {saved}"
+            )
+
+    def measure(self, repeat, build):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
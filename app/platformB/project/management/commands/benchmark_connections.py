@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет задержку запросов к API с учётом открытия соединений к БД. "
+        "Запускайте с DB_CONN_MAX_AGE=0, DB_CONN_MAX_AGE=60 и DB_POOL=True и сравнивайте результат."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь, например /api/v1/products/list/")
+        parser.add_argument('--token', help="Access-токен JWT")
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        db = settings.DATABASES['default']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)}, "
+            f"CONN_HEALTH_CHECKS={db.get('CONN_HEALTH_CHECKS', False)}, "
+            f"pool={db.get('OPTIONS', {}).get('pool', False)}"
+        ))
+
+        connects = 0
+
+        def on_connect(**kwargs):
+            nonlocal connects
+            connects += 1
+
+        connection_created.connect(on_connect)
+        connection.close()
+
+        client = Client(headers={'Authorization': f"Bearer {options['token']}"} if options['token'] else {})
+        host = next((host for host in settings.ALLOWED_HOSTS if host and '*' not in host and host[0] != '.'), 'localhost')
+        latencies = []
+        statuses = {}
+
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            # Тестовый клиент отключает close_old_connections, поэтому вызываем его сами, как обработчик gunicorn
+            close_old_connections()
+            response = client.get(options['path'], HTTP_HOST=host)
+            close_old_connections()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        connection_created.disconnect(on_connect)
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(f"статусы: {statuses}, вызовов connect(): {connects}")
+        self.stdout.write(self.style.SUCCESS(
+            f"задержка, ms: mean {statistics.mean(latencies) * 1000:.2f}, p50 {quantiles[49] * 1000:.2f}, "
+            f"p95 {quantiles[94] * 1000:.2f}, p99 {quantiles[98] * 1000:.2f}"
+        ))
@@ -0,0 +1,116 @@
+import datetime
+import io
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from project.analytics import sales_analytics
+from project.models import Company, Product, Supply, Sale
+from project.renderers import ORJSONRenderer, ORJSONParser, orjson
+from project.representations import ProductValuesSerializer, SupplyValuesSerializer, SaleValuesSerializer
+from project.serializer import SalesAnalyticsSerializer
+
+
+EDGE_CASES = {
+    'decimal': Decimal('1234.50'),
+    'decimal_list': [Decimal('0.01'), Decimal('-7'), Decimal('1E+2')],
+    'aware_datetime': datetime.datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+    'offset_datetime': datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=3))),
+    'naive_datetime': datetime.datetime(2025, 1, 2, 3, 4, 5),
+    'date': datetime.date(2025, 1, 2),
+    'time': datetime.time(3, 4, 5),
+    'timedelta': datetime.timedelta(hours=1, milliseconds=5),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'unicode': 'Продажа «тест»     \U0001F600',
+    'escapes': 'quote " backslash \\ tab \t newline \n',
+    'int_keys': {1: 'a', 2: 'b'},
+    'big_int': 2 ** 70,
+    'nested': [[], {}, None, True, False, 0, -1, 1.5],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет, что ORJSONRenderer и ORJSONParser дают тот же результат, что стандартные классы DRF, "
+        "и сравнивает их скорость на ответах API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help="Строк в каждом списке")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write("orjson не установлен, ORJSONRenderer использует стандартный json")
+
+        # Ответы API рендерятся с view в контексте, как в запросе: без renders_floats NaN не ищется
+        payloads = {'edge cases': (EDGE_CASES, {})}
+        for title, data in self.api_payloads(options['rows']).items():
+            payloads[title] = (data, {'view': APIView()})
+
+        mismatches = []
+        for title, (data, renderer_context) in payloads.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            mismatches += self.compare(title, data, renderer_context, options['repeat'])
+
+        if mismatches:
+            raise CommandError(f"Вывод отличается: {', '.join(mismatches)}")
+        self.stdout.write(self.style.SUCCESS("Вывод совпадает для всех ответов"))
+
+    def api_payloads(self, rows):
+        payloads = {}
+        for title, queryset, values_serializer in [
+            ('products', Product.objects.order_by('id'), ProductValuesSerializer),
+            ('supplies', Supply.objects.order_by('id'), SupplyValuesSerializer),
+            ('sales', Sale.objects.order_by('id'), SaleValuesSerializer),
+        ]:
+            payloads[title] = {
+                'next': None,
+                'previous': None,
+                'results': values_serializer.to_representation(values_serializer.values(queryset[:rows])),
+            }
+
+        company = Company.objects.filter(sale__isnull=False).first()
+        if company is not None:
+            today = timezone.localdate()
+            payloads['sales analytics'] = SalesAnalyticsSerializer(
+                sales_analytics(company.id, 'day', 10, start_date=today - datetime.timedelta(days=365), end_date=today)
+            ).data
+        return payloads
+
+    def compare(self, title, data, renderer_context, repeat):
+        mismatches = []
+
+        expected_time, expected = self.measure(repeat, lambda: JSONRenderer().render(data, None, renderer_context))
+        actual_time, actual = self.measure(repeat, lambda: ORJSONRenderer().render(data, None, renderer_context))
+        if expected != actual:
+            mismatches.append(f'{title}: render')
+
+        parsed_expected_time, parsed_expected = self.measure(repeat, lambda: JSONParser().parse(io.BytesIO(expected)))
+        parsed_actual_time, parsed_actual = self.measure(repeat, lambda: ORJSONParser().parse(io.BytesIO(expected)))
+        if parsed_expected != parsed_actual:
+            mismatches.append(f'{title}: parse')
+
+        size = len(expected) / 1024 / 1024
+        self.stdout.write(
+            f"{len(expected):>10} байт: render json {expected_time * 1000:8.1f} ms, "
+            f"orjson {actual_time * 1000:8.1f} ms ({size / actual_time:.0f} MB/s), x{expected_time / actual_time:.1f}; "
+            f"parse json {parsed_expected_time * 1000:8.1f} ms, orjson {parsed_actual_time * 1000:8.1f} ms, "
+            f"x{parsed_expected_time / parsed_actual_time:.1f}"
+        )
+        return mismatches
+
+    def measure(self, repeat, build):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
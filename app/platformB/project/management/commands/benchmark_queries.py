@@ -0,0 +1,136 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from project.models import Company, Storage, Supplier, Supply, Product, SupplyProduct, Sale, ProductSale
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу тестовыми данными и выводит планы и время горячих запросов. "
+        "Для сравнения запустите до и после `migrate project 0007`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="Создать тестовые данные перед замером")
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Количество продаж и поставок")
+        parser.add_argument('--companies', type=int, default=50)
+        parser.add_argument('--products', type=int, default=200, help="Товаров на компанию")
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        company = Company.objects.filter(name__startswith='bench-').order_by('id').first()
+        if company is None:
+            self.stderr.write("Нет тестовых данных, запустите команду с --seed")
+            return
+
+        storage = Storage.objects.get(company=company)
+        end = timezone.now()
+        start = end - timedelta(days=30)
+        product_id = Product.objects.filter(storage=storage).values_list('id', flat=True).first()
+
+        queries = {
+            'sales by company and date': Sale.objects.filter(
+                company=company, sale_date__gte=start, sale_date__lte=end
+            ).order_by('sale_date', 'id')[:100],
+            'supplies by company ordered by date': Supply.objects.filter(
+                supplier__company=company
+            ).order_by('delivery_date', 'id')[:100],
+            'products by storage': Product.objects.filter(storage=storage).order_by('id')[:100],
+            'sale lines by product': ProductSale.objects.filter(product_id=product_id).values_list('quantity'),
+            'supply lines by product': SupplyProduct.objects.filter(product_id=product_id).values_list('quantity'),
+        }
+
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+
+        for title, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain(**explain_options))
+
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset._chain())
+            elapsed = (time.perf_counter() - started) / options['repeat'] * 1000
+            self.stdout.write(self.style.SUCCESS(f"{elapsed:.2f} ms в среднем\n"))
+
+    def seed(self, options):
+        rows = options['rows']
+        batch_size = options['batch_size']
+        now = timezone.now()
+        tag = uuid.uuid4().hex[:8]
+
+        with transaction.atomic():
+            companies = Company.objects.bulk_create([
+                Company(name=f'bench-{tag}-{i}', inn=f'bench-{tag}-{i}') for i in range(options['companies'])
+            ])
+            storages = Storage.objects.bulk_create([
+                Storage(company=company, address='bench') for company in companies
+            ])
+            suppliers = Supplier.objects.bulk_create([
+                Supplier(company=company, title=f'bench-{tag}-{company.id}', inn=f'bench-{tag}-{company.id}')
+                for company in companies
+            ])
+            products = Product.objects.bulk_create([
+                Product(
+                    title=f'bench-{tag}-{storage.id}-{i}',
+                    purchase_price=Decimal('10.00'),
+                    sale_price=Decimal('15.00'),
+                    quantity=1000,
+                    storage=storage
+                )
+                for storage in storages for i in range(options['products'])
+            ], batch_size=batch_size)
+
+        products_by_company = {}
+        for product in products:
+            products_by_company.setdefault(product.storage.company_id, []).append(product.id)
+
+        for offset in range(0, rows, batch_size):
+            size = min(batch_size, rows - offset)
+            with transaction.atomic():
+                sales = Sale.objects.bulk_create([
+                    Sale(
+                        buyer_name=f'buyer-{offset + i}',
+                        company=random.choice(companies),
+                        sale_date=now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+                    )
+                    for i in range(size)
+                ])
+                ProductSale.objects.bulk_create([
+                    ProductSale(
+                        sale=sale,
+                        product_id=random.choice(products_by_company[sale.company_id]),
+                        quantity=random.randint(1, 5)
+                    )
+                    for sale in sales
+                ])
+
+                supplies = Supply.objects.bulk_create([
+                    Supply(
+                        supplier=random.choice(suppliers),
+                        delivery_date=now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+                    )
+                    for _ in range(size)
+                ])
+                SupplyProduct.objects.bulk_create([
+                    SupplyProduct(
+                        supply=supply,
+                        product_id=random.choice(products_by_company[supply.supplier.company_id]),
+                        quantity=random.randint(10, 50)
+                    )
+                    for supply in supplies
+                ])
+            self.stdout.write(f"{offset + size}/{rows}")
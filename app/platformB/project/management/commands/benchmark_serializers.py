@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from project.models import Product, Supply, Sale
+from project.representations import ProductValuesSerializer, SupplyValuesSerializer, SaleValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сериализацию списков через ModelSerializer и через values(). "
+        "Данные создаются командой `benchmark_queries --seed`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not Sale.objects.exists():
+            self.stderr.write("Нет тестовых данных, запустите `benchmark_queries --seed`")
+            return
+
+        renderer = JSONRenderer()
+        targets = [
+            (Product.objects.order_by('id'), ProductValuesSerializer),
+            (Supply.objects.order_by('id'), SupplyValuesSerializer),
+            (Sale.objects.order_by('id'), SaleValuesSerializer),
+        ]
+
+        for queryset, values_serializer in targets:
+            serializer_class = values_serializer.serializer_class
+            self.stdout.write(self.style.MIGRATE_HEADING(serializer_class.__name__))
+
+            for size in options['sizes']:
+                sliced = queryset[:size]
+
+                model_time, model_data = self.measure(
+                    options['repeat'], lambda: serializer_class(sliced._chain(), many=True).data
+                )
+                values_time, values_data = self.measure(
+                    options['repeat'], lambda: values_serializer.to_representation(values_serializer.values(sliced._chain()))
+                )
+                identical = renderer.render(model_data) == renderer.render(values_data)
+
+                self.stdout.write(
+                    f"{len(values_data):>7} строк: ModelSerializer {model_time * 1000:9.1f} ms, "
+                    f"values() {values_time * 1000:9.1f} ms, "
+                    f"x{model_time / values_time:.1f}, "
+                    + (self.style.SUCCESS("вывод совпадает") if identical else self.style.ERROR("ВЫВОД ОТЛИЧАЕТСЯ"))
+                )
+
+    def measure(self, repeat, build):
+        best, data = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
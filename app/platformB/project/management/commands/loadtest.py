@@ -0,0 +1,126 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: держит N keep-alive соединений и отправляет GET-запросы. "
+        "Запустите против SERVER_MODE=wsgi и SERVER_MODE=asgi с одинаковыми параметрами и сравните результат."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="Полные адреса, например http://localhost/api/v1/products/list/")
+        parser.add_argument('--token', help="Access-токен JWT")
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--duration', type=float, default=30, help="Длительность в секундах")
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--accept-encoding', default='',
+            help="Заголовок Accept-Encoding, например 'gzip, br'; сравните размер тел с ним и без него"
+        )
+
+    def handle(self, *args, **options):
+        targets = [urlsplit(url) for url in options['urls']]
+        if any(target.scheme != 'http' for target in targets):
+            raise CommandError("Поддерживается только http://")
+
+        latencies, statuses, errors, elapsed, received = asyncio.run(self.run(targets, options))
+
+        total = len(latencies)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['concurrency']} соединений, {elapsed:.1f} с"
+        ))
+        self.stdout.write(f"запросов: {total}, ошибок соединения: {errors}")
+        self.stdout.write(f"статусы: {dict(sorted(statuses.items()))}")
+        if total:
+            latencies.sort()
+            quantiles = statistics.quantiles(latencies, n=100) if total > 1 else latencies * 99
+            self.stdout.write(self.style.SUCCESS(f"RPS: {total / elapsed:.1f}"))
+            self.stdout.write(f"тело ответа: {received / total / 1024:.1f} KiB в среднем")
+            self.stdout.write(
+                f"задержка, ms: p50 {quantiles[49] * 1000:.1f}, p95 {quantiles[94] * 1000:.1f}, "
+                f"p99 {quantiles[98] * 1000:.1f}, max {latencies[-1] * 1000:.1f}"
+            )
+
+    async def run(self, targets, options):
+        latencies, statuses = [], {}
+        errors = received = 0
+        deadline = time.perf_counter() + options['duration']
+
+        async def worker(number):
+            nonlocal errors, received
+            target = targets[number % len(targets)]
+            request = self.build_request(target, options['token'], options['accept_encoding'])
+            reader = writer = None
+
+            while time.perf_counter() < deadline:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(target.hostname, target.port or 80)
+                    started = time.perf_counter()
+                    writer.write(request)
+                    status, keep_alive, size = await asyncio.wait_for(self.read_response(reader), options['timeout'])
+                    latencies.append(time.perf_counter() - started)
+                    received += size
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if not keep_alive:
+                        writer.close()
+                        writer = None
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    if writer is not None:
+                        writer.close()
+                    writer = None
+
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(number) for number in range(options['concurrency'])))
+        return latencies, statuses, errors, time.perf_counter() - started, received
+
+    def build_request(self, target, token, accept_encoding=''):
+        path = target.path or '/'
+        if target.query:
+            path = f'{path}?{target.query}'
+        lines = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {target.netloc}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+        ]
+        if token:
+            lines.append(f'Authorization: Bearer {token}')
+        if accept_encoding:
+            lines.append(f'Accept-Encoding: {accept_encoding}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def read_response(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        received = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                received += size
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            received = int(headers['content-length'])
+            await reader.readexactly(received)
+        else:
+            return status, False, len(await reader.read())
+
+        return status, headers.get('connection', '').lower() != 'close', received
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from project.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные ключи идемпотентности. Запускайте по расписанию (cron)."
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Удалено ключей: {deleted}"))
@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections
+from django.utils import timezone
+
+from project.models import Company, Storage, Product, Sale, ProductSale
+from project.services import StockShortage, book_sale
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочная проверка списания остатков: много потоков одновременно продают один товар. "
+        "Проверяет, что проданное количество не превышает остаток и остаток не уходит в минус. "
+        "Запускайте на Postgres: SQLite сериализует запись на уровне файла."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--sales', type=int, default=2000, help="Всего попыток продажи")
+        parser.add_argument('--stock', type=int, default=1000, help="Начальный остаток товара")
+        parser.add_argument('--quantity', type=int, default=3, help="Штук в одной продаже")
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        company = Company.objects.create(name=f'stress-{tag}', inn=f'stress-{tag}')
+        storage = Storage.objects.create(company=company, address='stress')
+        product = Product.objects.create(
+            title=f'stress-{tag}',
+            purchase_price=Decimal('1.00'),
+            sale_price=Decimal('2.00'),
+            quantity=options['stock'],
+            storage=storage
+        )
+
+        attempts = iter(range(options['sales']))
+        lock = threading.Lock()
+        results = {'booked': 0, 'rejected': 0, 'errors': 0}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(attempts, None) is None:
+                            return
+                    try:
+                        book_sale(
+                            company=company,
+                            buyer_name='stress',
+                            sale_date=timezone.now(),
+                            product_sales=[{'product_id': product.id, 'quantity': options['quantity']}]
+                        )
+                        outcome = 'booked'
+                    except StockShortage:
+                        outcome = 'rejected'
+                    except DatabaseError as e:
+                        self.stderr.write(str(e))
+                        outcome = 'errors'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        sold = sum(ProductSale.objects.filter(product=product).values_list('quantity', flat=True))
+        sales = Sale.objects.filter(company=company).count()
+        expected_booked = min(options['sales'], options['stock'] // options['quantity'])
+
+        self.stdout.write(
+            f"{connection.vendor}: {options['threads']} потоков, {options['sales']} попыток за {elapsed:.2f} с "
+            f"({options['sales'] / elapsed:.0f} попыток/с)"
+        )
+        self.stdout.write(
+            f"продано: {results['booked']}, отказано: {results['rejected']}, ошибок БД: {results['errors']}; "
+            f"остаток {product.quantity} из {options['stock']}, в строках продаж {sold} шт."
+        )
+
+        problems = []
+        if product.quantity < 0:
+            problems.append("остаток отрицательный")
+        if sold + product.quantity != options['stock']:
+            problems.append("проданное количество не сходится с остатком")
+        if sales != results['booked']:
+            problems.append("есть продажи без списания или списания без продажи")
+        if sold > options['stock']:
+            problems.append("продано больше начального остатка")
+        if results['errors']:
+            problems.append(f"ошибок БД: {results['errors']}")
+        if results['booked'] != expected_booked:
+            problems.append(f"ожидалось {expected_booked} успешных продаж")
+
+        Company.objects.filter(pk=company.pk).delete()
+
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS("Остаток не перепродан"))
@@ -0,0 +1,129 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .compression import acompress_chunks, compress, compress_chunks, negotiate_encoding
+from .routers import start_routing, stop_routing, use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _sticky_key(request):
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return f'db-primary:{hashlib.sha1(authorization.encode()).hexdigest()}'
+
+
+class ReplicaRoutingMiddleware:
+    # Безопасные запросы читают с реплик. После записи тот же клиент (по заголовку Authorization)
+    # DB_REPLICA_STICKY_SECONDS читает из основной базы. Метка хранится в кэше default, общем для воркеров (project.E003).
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+
+        key = _sticky_key(request)
+        token = start_routing(request.method in SAFE_METHODS and not (key and cache.get(key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_routing(token)
+
+        if key and request.method not in SAFE_METHODS:
+            cache.set(key, True, settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+
+        key = _sticky_key(request)
+        token = start_routing(request.method in SAFE_METHODS and not (key and await cache.aget(key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_routing(token)
+
+        if key and request.method not in SAFE_METHODS:
+            await cache.aset(key, True, settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', view_func)
+        if getattr(view, 'use_primary_db', False):
+            use_primary()
+        return None
+
+
+class CompressionMiddleware:
+    # RESPONSE_COMPRESSION=streaming: сжимаем только потоковые ответы (выгрузки), обычные сжимает nginx;
+    # all — все ответы, когда приложение работает без nginx; off — middleware отключается
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.RESPONSE_COMPRESSION == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(settings.RESPONSE_COMPRESSION_TYPES):
+            return response
+        if not response.streaming and (
+            settings.RESPONSE_COMPRESSION != 'all'
+            or len(response.content) < settings.RESPONSE_COMPRESSION_MIN_LENGTH
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_chunks(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_chunks(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # Сжатое тело отличается побайтно, поэтому ETag становится слабым, как у nginx gzip
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
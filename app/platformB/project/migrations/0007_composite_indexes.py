@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0006_alter_productsale_product_alter_productsale_sale'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['storage', 'id'], name='product_storage_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsale',
+            index=models.Index(fields=['sale'], include=('product', 'quantity'), name='productsale_sale_cov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsale',
+            index=models.Index(fields=['product'], include=('quantity',), name='productsale_product_cov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['company', 'sale_date', 'id'], name='sale_company_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supply',
+            index=models.Index(fields=['supplier', 'delivery_date', 'id'], name='supply_supplier_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyproduct',
+            index=models.Index(fields=['supply'], include=('product', 'quantity'), name='supplyproduct_supply_cov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supplyproduct',
+            index=models.Index(fields=['product'], include=('quantity',), name='supplyproduct_product_cov_idx'),
+        ),
+        # Составные индексы выше начинаются с внешнего ключа, поэтому его отдельный индекс не нужен
+        migrations.AlterField(
+            model_name='product',
+            name='storage',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.storage'),
+        ),
+        migrations.AlterField(
+            model_name='productsale',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.product'),
+        ),
+        migrations.AlterField(
+            model_name='productsale',
+            name='sale',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_sales', to='project.sale'),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='company',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.company'),
+        ),
+        migrations.AlterField(
+            model_name='supply',
+            name='supplier',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.supplier'),
+        ),
+        migrations.AlterField(
+            model_name='supplyproduct',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.product'),
+        ),
+        migrations.AlterField(
+            model_name='supplyproduct',
+            name='supply',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='project.supply'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='storage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
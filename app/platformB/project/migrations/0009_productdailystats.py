@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_stats(apps, schema_editor):
+    ProductSale = apps.get_model('project', 'ProductSale')
+    SupplyProduct = apps.get_model('project', 'SupplyProduct')
+    ProductDailyStats = apps.get_model('project', 'ProductDailyStats')
+
+    stats = {}
+    sold = ProductSale.objects.annotate(day=TruncDate('sale__sale_date')).values(
+        'product_id', 'product__storage__company_id', 'day'
+    ).annotate(total=Sum('quantity'))
+    for row in sold:
+        key = (row['product_id'], row['day'])
+        stats.setdefault(key, ProductDailyStats(
+            product_id=row['product_id'], company_id=row['product__storage__company_id'], day=row['day']
+        )).units_sold = row['total']
+
+    received = SupplyProduct.objects.annotate(day=TruncDate('supply__delivery_date')).values(
+        'product_id', 'product__storage__company_id', 'day'
+    ).annotate(total=Sum('quantity'))
+    for row in received:
+        key = (row['product_id'], row['day'])
+        stats.setdefault(key, ProductDailyStats(
+            product_id=row['product_id'], company_id=row['product__storage__company_id'], day=row['day']
+        )).units_received = row['total']
+
+    ProductDailyStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units_sold', models.IntegerField(default=0)),
+                ('units_received', models.IntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='project.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='project.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'day'], name='productdailystats_company_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='productdailystats_product_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0010_product_quantity_check'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('response', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='project.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='idempotencykey_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('company', 'scope', 'key'), name='idempotencykey_unique')],
+            },
+        ),
+    ]
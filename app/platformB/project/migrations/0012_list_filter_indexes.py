@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+from project.operations import PostgresRunSQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['storage', 'title'], name='product_storage_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['storage', 'sale_price', 'id'], name='product_storage_price_idx'),
+        ),
+        # icontains/istartswith в Postgres сравнивают UPPER(поле), поэтому индексируем то же выражение.
+        # Индексы не описаны в Meta.indexes: GIN и pg_trgm есть только в Postgres.
+        PostgresRunSQL(
+            sql=[
+                'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+                'CREATE INDEX product_title_trgm_idx ON project_product USING gin ((UPPER(title)) gin_trgm_ops)',
+                'CREATE INDEX sale_buyer_trgm_idx ON project_sale USING gin ((UPPER(buyer_name)) gin_trgm_ops)',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS sale_buyer_trgm_idx',
+                'DROP INDEX IF EXISTS product_title_trgm_idx',
+                'DROP EXTENSION IF EXISTS pg_trgm',
+            ],
+        ),
+    ]
@@ -1,9 +1,11 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
 class Company(models.Model):
     name = models.CharField(max_length=100, unique=True)
     inn = models.CharField(max_length=50, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -12,6 +14,7 @@ class Company(models.Model):
 class Storage(models.Model):
     company = models.OneToOneField(Company, on_delete=models.CASCADE)
     address = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Склад компании {self.company.name}"
@@ -27,9 +30,14 @@ class Supplier(models.Model):
 
 
 class Supply(models.Model):
-    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, db_index=False)
     delivery_date = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['supplier', 'delivery_date', 'id'], name='supply_supplier_date_idx'),
+        ]
+
     def __str__(self):
         return f"Поставка - {self.supplier}"
 
@@ -39,31 +47,103 @@ class Product(models.Model):
     purchase_price = models.DecimalField(max_digits=10, decimal_places=2)
     sale_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=0)
-    storage = models.ForeignKey(Storage, on_delete=models.CASCADE)
+    storage = models.ForeignKey(Storage, on_delete=models.CASCADE, db_index=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['storage', 'id'], name='product_storage_id_idx'),
+            models.Index(fields=['storage', 'title'], name='product_storage_title_idx'),
+            models.Index(fields=['storage', 'sale_price', 'id'], name='product_storage_price_idx'),
+            # Триграммный GIN-индекс по UPPER(title) только для Postgres, см. миграцию 0012
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity__gte=0), name='product_quantity_non_negative'),
+        ]
 
     def __str__(self):
         return f"Продукт - {self.title}"
 
 
 class SupplyProduct(models.Model):
-    supply = models.ForeignKey(Supply, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    supply = models.ForeignKey(Supply, on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
     quantity = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['supply'], include=['product', 'quantity'], name='supplyproduct_supply_cov_idx'),
+            models.Index(fields=['product'], include=['quantity'], name='supplyproduct_product_cov_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} {self.product.title} в поставке {self.supply.id}"
 
 
 class Sale(models.Model):
     buyer_name = models.CharField(max_length=100)
-    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, db_index=False)
     sale_date = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'sale_date', 'id'], name='sale_company_date_idx'),
+            # Триграммный GIN-индекс по UPPER(buyer_name) только для Postgres, см. миграцию 0012
+        ]
 
     def __str__(self):
         return f"Продажа - {self.buyer_name}"
 
 
 class ProductSale(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    sale = models.ForeignKey(Sale, related_name='product_sales', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
+    sale = models.ForeignKey(Sale, related_name='product_sales', on_delete=models.CASCADE, db_index=False)
     quantity = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sale'], include=['product', 'quantity'], name='productsale_sale_cov_idx'),
+            models.Index(fields=['product'], include=['quantity'], name='productsale_product_cov_idx'),
+        ]
+
+
+class ProductDailyStats(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    day = models.DateField()
+    units_sold = models.IntegerField(default=0)
+    units_received = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='productdailystats_product_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'day'], name='productdailystats_company_idx'),
+        ]
+
+    def __str__(self):
+        return f"Статистика {self.product_id} за {self.day}"
+
+
+class IdempotencyKey(models.Model):
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'scope', 'key'], name='idempotencykey_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotencykey_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.key}"
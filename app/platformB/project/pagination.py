@@ -0,0 +1,36 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # CursorPagination сама выполняет запрос страницы, поэтому запускаем её так же, как async ORM
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_values_queryset(self, representation, queryset, request, view=None):
+        fieldset = representation.get_fieldset(request)
+        # Курсор читает колонки сортировки из строки, даже если их нет среди запрошенных полей
+        ordering = [field.lstrip('-') for field in self.get_ordering(request, queryset, view)]
+        return fieldset, representation.values(queryset, fieldset, extra=ordering)
+
+    def paginate_values(self, representation, queryset, request, view=None):
+        fieldset, rows = self.get_values_queryset(representation, queryset, request, view)
+        page = self.paginate_queryset(rows, request, view=view)
+        return self.get_paginated_response(representation.to_representation(page, fieldset))
+
+    async def apaginate_values(self, representation, queryset, request, view=None):
+        fieldset, rows = self.get_values_queryset(representation, queryset, request, view)
+        page = await self.apaginate_queryset(rows, request, view=view)
+        return self.get_paginated_response(await representation.ato_representation(page, fieldset))
+
+
+class SupplyPagination(KeysetPagination):
+    ordering = ('delivery_date', 'id')
+
+
+class SalePagination(KeysetPagination):
+    ordering = ('sale_date', 'id')
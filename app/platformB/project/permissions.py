@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from .models import Storage
+from .tenant import get_tenant
 
 
 class IsCompanyOwnerOrReadOnly(permissions.BasePermission):
@@ -8,18 +9,21 @@ class IsCompanyOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        return request.user.is_company_owner and request.user.company == obj
+        tenant = get_tenant(request)
+        return tenant.is_company_owner and tenant.company_id == obj.pk
 
 
 class IsRelatedToCompany(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.company is not None
+        return get_tenant(request).company_id is not None
 
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, 'company'):
-            return obj.company == request.user.company
+        tenant = get_tenant(request)
 
-        if hasattr(obj, 'storage'):
-            return obj.storage.company == request.user.company
+        if hasattr(obj, 'company_id'):
+            return obj.company_id == tenant.company_id
 
-        return False
\ No newline at end of file
+        if hasattr(obj, 'storage_id'):
+            return tenant.storage_id is not None and obj.storage_id == tenant.storage_id
+
+        return False
@@ -0,0 +1,83 @@
+import io
+import math
+from decimal import Decimal
+
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Даты и dataclass отдаём в JSONEncoder DRF, чтобы формат совпадал со стандартным рендерером
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None else 0
+)
+
+
+# Типы, которые точно не float: на строках списков проверка сводится к одному поиску в множестве
+_SCALAR_TYPES = frozenset({str, int, bool, type(None), Decimal})
+
+
+def _has_non_finite_float(data):
+    stack = [(data,)]
+    while stack:
+        value = stack.pop()
+        for item in (value.values() if isinstance(value, dict) else value):
+            if type(item) in _SCALAR_TYPES:
+                continue
+            if isinstance(item, float):
+                if not math.isfinite(item):
+                    return True
+            elif isinstance(item, (dict, list, tuple)):
+                stack.append(item)
+    return False
+
+
+def _may_contain_floats(renderer_context):
+    # Сериализаторы проекта отдают деньги и количества как Decimal и int, поэтому ответы обычных view
+    # не обходим. View с float в ответе объявляет renders_floats = True; без view (рендер вне запроса)
+    # проверяем всегда.
+    view = renderer_context.get('view')
+    return view is None or getattr(view, 'renders_floats', False)
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Отличие от JSONRenderer: float пишется короче (1e16 вместо 1e+16), значение при разборе то же.
+    # NaN и Infinity orjson молча превращает в null, поэтому такие данные отдаём стандартному рендереру:
+    # он выбрасывает ValueError при STRICT_JSON, как и без orjson.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if orjson is None or self.ensure_ascii or not self.compact or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _may_contain_floats(renderer_context) and _has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or get_encoding(parser_context or {}).lower() not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        content = stream.read()
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Ошибку отдаём стандартным парсером, чтобы сообщение не отличалось
+            return super().parse(io.BytesIO(content), media_type, parser_context)
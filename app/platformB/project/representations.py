@@ -0,0 +1,264 @@
+import decimal
+
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .serializer import (
+    CompanySerializer, StorageDetailSerializer, SupplierSerializer, ProductSerializer, SupplySerializer,
+    SupplyProductSerializer, SaleSerializer, ProductSaleSerializer
+)
+
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.PrimaryKeyRelatedField
+)
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+
+    return convert
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+
+    return convert
+
+
+def _converter(field):
+    # Для полей, которые DRF отдаёт как есть, конвертер не нужен
+    if isinstance(field, PASSTHROUGH_FIELDS) and not isinstance(field, serializers.DecimalField):
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    return field.to_representation
+
+
+def _split(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        description="Поля ответа через запятую, например fields=id,sale_date. По умолчанию все поля"
+    ),
+    OpenApiParameter(
+        'expand',
+        description="Вложенные списки через запятую, например expand=product_sales. "
+                    "Если передан fields или expand, вложенные списки отдаются только по запросу"
+    ),
+]
+
+
+# Read-only вывод списков через values(): тот же JSON, что у serializer_class,
+# но без создания моделей и обхода полей DRF на каждой строке
+class ValuesSerializer:
+    serializer_class = None
+    # имя поля -> (ValuesSerializer вложенных строк, колонка внешнего ключа)
+    children = {}
+
+    _fields = None
+
+    @classmethod
+    def get_fields(cls):
+        if cls.__dict__.get('_fields') is None:
+            model = cls.serializer_class.Meta.model
+            fields = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if name in cls.children:
+                    fields.append((name, name, None))
+                elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                    fields.append((name, model._meta.get_field(field.source).attname, field))
+                else:
+                    fields.append((name, field.source, field))
+            cls._fields = fields
+        return cls._fields
+
+    @classmethod
+    def get_fieldset(cls, request):
+        # None — полный ответ; иначе множество запрошенных полей верхнего уровня
+        fields = request.query_params.get('fields')
+        expand = request.query_params.get('expand')
+        if fields is None and expand is None:
+            return None
+
+        names = [name for name, column, field in cls.get_fields()]
+        errors = {}
+
+        selected = set(_split(fields or '')) or set(names) - cls.children.keys()
+        unknown = selected - set(names)
+        if unknown:
+            errors['fields'] = [f"Неизвестные поля: {', '.join(sorted(unknown))}"]
+
+        expanded = set(_split(expand or ''))
+        unknown = expanded - cls.children.keys()
+        if unknown:
+            errors['expand'] = [f"Нельзя развернуть: {', '.join(sorted(unknown))}"]
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return frozenset(selected | expanded)
+
+    @classmethod
+    def get_selected_fields(cls, fieldset=None):
+        if fieldset is None:
+            return cls.get_fields()
+        return [item for item in cls.get_fields() if item[0] in fieldset]
+
+    @classmethod
+    def get_selected_children(cls, fieldset=None):
+        return {name: child for name, child in cls.children.items() if fieldset is None or name in fieldset}
+
+    @classmethod
+    def get_columns(cls, fieldset=None):
+        return [column for name, column, field in cls.get_selected_fields(fieldset) if name not in cls.children]
+
+    @classmethod
+    def values(cls, queryset, fieldset=None, extra=()):
+        # id нужен для вложенных списков, extra — колонки, которые читает вызывающий код (курсор, версия)
+        columns = cls.get_columns(fieldset)
+        if cls.get_selected_children(fieldset):
+            columns.append('id')
+        return queryset.values(*dict.fromkeys([*columns, *extra]))
+
+    @classmethod
+    def retrieve(cls, queryset, fieldset=None, extra=()):
+        row = cls.values(queryset, fieldset, extra).first()
+        if row is None:
+            return None, None
+        return row, cls.to_representation([row], fieldset)[0]
+
+    @classmethod
+    async def aretrieve(cls, queryset, fieldset=None, extra=()):
+        row = await cls.values(queryset, fieldset, extra).afirst()
+        if row is None:
+            return None, None
+        return row, (await cls.ato_representation([row], fieldset))[0]
+
+    @classmethod
+    def get_row_converter(cls, fieldset=None):
+        layout = [
+            (name, column, _converter(field) if field is not None else None)
+            for name, column, field in cls.get_selected_fields(fieldset)
+        ]
+
+        def convert(row):
+            result = {}
+            for name, column, converter in layout:
+                value = row[column]
+                result[name] = value if converter is None or value is None else converter(value)
+            return result
+
+        return convert
+
+    @classmethod
+    def fetch_children(cls, parent_ids, fk):
+        grouped = {}
+        convert = cls.get_row_converter()
+        rows = cls.serializer_class.Meta.model.objects.filter(
+            **{f'{fk}__in': parent_ids}
+        ).values(fk, *cls.get_columns())
+        for row in rows:
+            grouped.setdefault(row[fk], []).append(convert(row))
+        return grouped
+
+    @classmethod
+    async def afetch_children(cls, parent_ids, fk):
+        grouped = {}
+        convert = cls.get_row_converter()
+        rows = cls.serializer_class.Meta.model.objects.filter(
+            **{f'{fk}__in': parent_ids}
+        ).values(fk, *cls.get_columns())
+        async for row in rows:
+            grouped.setdefault(row[fk], []).append(convert(row))
+        return grouped
+
+    @classmethod
+    def _attach_children(cls, rows, children):
+        for name, grouped in children.items():
+            for row in rows:
+                row[name] = grouped.get(row['id'], [])
+
+    @classmethod
+    def to_representation(cls, rows, fieldset=None):
+        rows = list(rows)
+        children = cls.get_selected_children(fieldset)
+        if children and rows:
+            ids = [row['id'] for row in rows]
+            cls._attach_children(rows, {
+                name: child.fetch_children(ids, fk) for name, (child, fk) in children.items()
+            })
+        convert = cls.get_row_converter(fieldset)
+        return [convert(row) for row in rows]
+
+    @classmethod
+    async def ato_representation(cls, rows, fieldset=None):
+        rows = list(rows)
+        children = cls.get_selected_children(fieldset)
+        if children and rows:
+            ids = [row['id'] for row in rows]
+            cls._attach_children(rows, {
+                name: await child.afetch_children(ids, fk) for name, (child, fk) in children.items()
+            })
+        convert = cls.get_row_converter(fieldset)
+        return [convert(row) for row in rows]
+
+
+class CompanyValuesSerializer(ValuesSerializer):
+    serializer_class = CompanySerializer
+
+
+class StorageValuesSerializer(ValuesSerializer):
+    serializer_class = StorageDetailSerializer
+
+
+class SupplierValuesSerializer(ValuesSerializer):
+    serializer_class = SupplierSerializer
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    serializer_class = ProductSerializer
+
+
+class SupplyProductValuesSerializer(ValuesSerializer):
+    serializer_class = SupplyProductSerializer
+
+
+class SupplyValuesSerializer(ValuesSerializer):
+    serializer_class = SupplySerializer
+    children = {'products': (SupplyProductValuesSerializer, 'supply_id')}
+
+
+class ProductSaleValuesSerializer(ValuesSerializer):
+    serializer_class = ProductSaleSerializer
+
+
+class SaleValuesSerializer(ValuesSerializer):
+    serializer_class = SaleSerializer
+    children = {'product_sales': (ProductSaleValuesSerializer, 'sale_id')}
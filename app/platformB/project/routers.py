@@ -0,0 +1,55 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, replica):
+        # None - все запросы идут в основную базу
+        self.replica = replica
+
+
+def start_routing(use_replica):
+    replica = random.choice(settings.REPLICA_DATABASES) if use_replica and settings.REPLICA_DATABASES else None
+    return _routing.set(RoutingState(replica))
+
+
+def stop_routing(token):
+    _routing.reset(token)
+
+
+def use_primary():
+    state = _routing.get()
+    if state is not None:
+        state.replica = None
+
+
+def use_primary_db(view):
+    # Для функций-представлений; у классов достаточно атрибута use_primary_db = True
+    view.use_primary_db = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Связанные объекты и prefetch читаем из той же базы, что и сам объект
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _routing.get()
+        if state is None or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        # Внутри транзакции читаем то, что только что записали
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -1,25 +1,58 @@
+from django.conf import settings
+from django.db.models import QuerySet, prefetch_related_objects
 from rest_framework import serializers
 from .models import Company, Storage, Supplier, Product, Supply, SupplyProduct, Sale, ProductSale
+from .services import book_sale
+from .tenant import get_tenant
+
+
+class EagerLoadingListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if isinstance(data, QuerySet):
+            data = self.child.setup_eager_loading(data)
+        elif isinstance(data, list) and data:
+            prefetch_related_objects(data, *self.child.get_related_lookups())
+        return super().to_representation(data)
+
+
+class EagerLoadingMixin:
+    @classmethod
+    def get_related_lookups(cls):
+        return [
+            *getattr(cls.Meta, 'select_related_fields', ()),
+            *getattr(cls.Meta, 'prefetch_related_fields', ()),
+        ]
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        select_related_fields = getattr(cls.Meta, 'select_related_fields', ())
+        prefetch_related_fields = getattr(cls.Meta, 'prefetch_related_fields', ())
+
+        if select_related_fields:
+            queryset = queryset.select_related(*select_related_fields)
+        if prefetch_related_fields:
+            queryset = queryset.prefetch_related(*prefetch_related_fields)
+        return queryset
 
 
 class CompanySerializer(serializers.ModelSerializer):
     class Meta:
         model = Company
-        fields = '__all__'
+        exclude = ['updated_at']
         read_only_fields = ['id']
 
 
 class StorageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Storage
-        fields = '__all__'
+        exclude = ['updated_at']
         read_only_fields = ['id', 'company']
 
 
 class StorageDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Storage
-        fields = '__all__'
+        exclude = ['updated_at']
         read_only_fields = ['id']
 
 
@@ -33,23 +66,141 @@ class SupplierSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['updated_at']
         read_only_fields = ['id', 'quantity', 'storage']
 
 
+class ProductBatchItemSerializer(ProductSerializer):
+    # Уникальность названий проверяется одним запросом на весь пакет, а не запросом на каждый товар
+    class Meta(ProductSerializer.Meta):
+        extra_kwargs = {'title': {'validators': []}}
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), default=list)
+    update = serializers.ListField(child=serializers.DictField(), default=list)
+    # id удаляемых товаров разбираются в validate, чтобы ошибка в одном id не скрывала ошибки остальных операций
+    delete = serializers.ListField(default=list)
+
+    def validate(self, attrs):
+        total = len(attrs['create']) + len(attrs['update']) + len(attrs['delete'])
+        if not total:
+            raise serializers.ValidationError({"detail": "Пакет операций пуст"})
+        if total > settings.PRODUCT_BATCH_MAX_ITEMS:
+            raise serializers.ValidationError(
+                {"detail": f"В пакете не может быть больше {settings.PRODUCT_BATCH_MAX_ITEMS} операций"}
+            )
+
+        errors = {'create': {}, 'update': {}, 'delete': {}}
+        id_field = serializers.IntegerField()
+        update_ids = {}
+        for index, item in enumerate(attrs['update']):
+            try:
+                update_ids[index] = id_field.run_validation(item.get('id', serializers.empty))
+            except serializers.ValidationError as e:
+                errors['update'][index] = {'id': e.detail}
+        delete_ids = {}
+        for index, value in enumerate(attrs['delete']):
+            try:
+                delete_ids[index] = id_field.run_validation(value)
+            except serializers.ValidationError as e:
+                errors['delete'][index] = e.detail
+
+        # Принадлежность компании проверяется одним запросом для всех изменяемых и удаляемых товаров
+        products = Product.objects.filter(storage__company_id=self.context['company_id']).in_bulk(
+            [*update_ids.values(), *delete_ids.values()]
+        )
+
+        seen = set()
+        delete = []
+        for index, product_id in delete_ids.items():
+            if product_id not in products:
+                errors['delete'][index] = ["Продукт не найден"]
+            elif product_id in seen:
+                errors['delete'][index] = ["Продукт указан в пакете несколько раз"]
+            else:
+                seen.add(product_id)
+                delete.append(product_id)
+
+        update = []
+        for index, product_id in update_ids.items():
+            if product_id not in products:
+                errors['update'][index] = {'id': ["Продукт не найден"]}
+                continue
+            if product_id in seen:
+                errors['update'][index] = {'id': ["Продукт указан в пакете несколько раз"]}
+                continue
+            seen.add(product_id)
+            data = {key: value for key, value in attrs['update'][index].items() if key != 'id'}
+            item = ProductBatchItemSerializer(products[product_id], data=data, partial=True)
+            if item.is_valid():
+                update.append((index, products[product_id], item.validated_data))
+            else:
+                errors['update'][index] = item.errors
+
+        create = []
+        for index, data in enumerate(attrs['create']):
+            item = ProductBatchItemSerializer(data=data)
+            if item.is_valid():
+                create.append((index, item.validated_data))
+            else:
+                errors['create'][index] = item.errors
+
+        titles = {}
+        for index, data in create:
+            titles.setdefault(data['title'], []).append(('create', index))
+        for index, product, data in update:
+            if 'title' in data and data['title'] != product.title:
+                titles.setdefault(data['title'], []).append(('update', index))
+
+        self._titles, self._delete = titles, delete
+        for operation, items in self.get_title_errors().items():
+            errors[operation].update(items)
+
+        errors = {operation: dict(sorted(items.items())) for operation, items in errors.items() if items}
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return {
+            'create': [data for _, data in create],
+            'update': [(product, data) for _, product, data in update],
+            'delete': delete,
+        }
+
+    def get_title_errors(self):
+        # Вызывается и после записи: если название занял параллельный запрос, ошибка придёт от базы
+        taken = set(
+            Product.objects.filter(title__in=self._titles).exclude(pk__in=self._delete).values_list('title', flat=True)
+        ) if self._titles else set()
+
+        errors = {}
+        for title, items in self._titles.items():
+            if title in taken or len(items) > 1:
+                for operation, index in items:
+                    errors.setdefault(operation, {})[index] = {'title': ["Продукт с таким названием уже существует"]}
+        return {operation: dict(sorted(items.items())) for operation, items in errors.items()}
+
+
 class SupplyProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupplyProduct
         fields = ['product', 'quantity']
 
 
-class SupplySerializer(serializers.ModelSerializer):
+class SupplyItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class SupplySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     products = serializers.SerializerMethodField()
 
     class Meta:
         model = Supply
         fields = ['id', 'supplier', 'delivery_date', 'products']
         read_only_fields = ['id']
+        prefetch_related_fields = ['supplyproduct_set']
+        list_serializer_class = EagerLoadingListSerializer
 
     def get_products(self, obj):
         supply_products = obj.supplyproduct_set.all()
@@ -60,61 +211,90 @@ class SupplySerializer(serializers.ModelSerializer):
 
 class ProductSaleSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
-    quantity = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = ProductSale
         fields = ['product_id', 'quantity']
 
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     product_sales = ProductSaleSerializer(many=True)
 
     class Meta:
         model = Sale
         fields = ['id', 'buyer_name', 'sale_date', 'product_sales']
         read_only_fields = ['id']
+        prefetch_related_fields = ['product_sales']
+        list_serializer_class = EagerLoadingListSerializer
 
     def create(self, validated_data):
-        product_sales_data = validated_data.pop('product_sales')
-        sale = Sale.objects.create(
+        return book_sale(
+            company=get_tenant(self.context['request']).company,
             buyer_name=validated_data['buyer_name'],
-            company=self.context['request'].user.company,
-            sale_date=validated_data['sale_date']
+            sale_date=validated_data['sale_date'],
+            product_sales=validated_data['product_sales']
         )
 
-        for product_sale_data in product_sales_data:
-            try:
-                product_id = product_sale_data['product_id']
-                quantity = product_sale_data['quantity']
+class SaleUpdateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Sale
+        fields = ['buyer_name', 'sale_date']
+        read_only_fields = ['id']
 
-                product = Product.objects.get(id=product_id)
 
-                if product.quantity < quantity:
-                    raise serializers.ValidationError({
-                        'detail': f"Недостаточно товара {product.name}. "
-                                  f"Доступно: {product.quantity}, "
-                                  f"Запрошено: {quantity}"
-                    })
+class ProductStatsQuerySerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    product = serializers.IntegerField(required=False)
+    by = serializers.ChoiceField(choices=['product', 'day'], default='product')
 
-                ProductSale.objects.create(
-                    sale=sale,
-                    product_id=product_id,
-                    quantity=quantity
-                )
 
-                product.quantity -= quantity
-                product.save()
+class ProductStatsSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    title = serializers.CharField(source='product__title')
+    day = serializers.DateField(required=False)
+    units_sold = serializers.IntegerField(source='sold')
+    units_received = serializers.IntegerField(source='received')
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    cost = serializers.DecimalField(max_digits=14, decimal_places=2)
+    margin = serializers.DecimalField(max_digits=14, decimal_places=2)
 
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(
-                    f"Товар с ID {product_id} не найден"
-                )
 
-        return sale
+class SalesAnalyticsQuerySerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    bucket = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
 
-class SaleUpdateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Sale
-        fields = ['buyer_name', 'sale_date']
-        read_only_fields = ['id']
\ No newline at end of file
+
+class SalesMetricsSerializer(serializers.Serializer):
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    profit = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SalesPeriodSerializer(SalesMetricsSerializer):
+    period = serializers.DateTimeField()
+    cumulative_revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SalesTopProductSerializer(SalesMetricsSerializer):
+    rank = serializers.IntegerField()
+    product_id = serializers.IntegerField()
+    title = serializers.CharField(source='product__title')
+
+
+class SalesAnalyticsSerializer(serializers.Serializer):
+    bucket = serializers.CharField()
+    start_date = serializers.DateField(allow_null=True)
+    end_date = serializers.DateField(allow_null=True)
+    totals = SalesMetricsSerializer()
+    series = SalesPeriodSerializer(many=True)
+    top_products = SalesTopProductSerializer(many=True)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='ndjson')
+    start_date = serializers.DateTimeField(required=False)
+    end_date = serializers.DateTimeField(required=False)
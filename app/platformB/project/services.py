@@ -0,0 +1,213 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied
+
+from .models import Storage, Product, Supply, SupplyProduct, Sale, ProductSale
+from .stats import record_product_stats, record_sale_stats, sale_lines, stats_day
+
+
+def _merge_lines(lines, product_key):
+    totals = {}
+    for line in lines:
+        product_id = line[product_key]
+        totals[product_id] = totals.get(product_id, 0) + line['quantity']
+    return totals
+
+
+def _quantity_delta(totals, sign):
+    return Case(
+        *[When(id=product_id, then=F('quantity') + sign * quantity) for product_id, quantity in totals.items()],
+        default=F('quantity'),
+        output_field=PositiveIntegerField()
+    )
+
+
+class StockShortage(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Недостаточно товара на складе"
+    default_code = 'stock_shortage'
+
+    def __init__(self, detail):
+        # ValidationError превратил бы числа в строки, а клиенту нужны requested и available как числа
+        self.detail = detail
+
+
+class _StockChanged(Exception):
+    pass
+
+
+def _company_storage_ids(company):
+    return list(Storage.objects.filter(company=company).values_list('id', flat=True))
+
+
+def _report_stock_shortage(storage_ids, totals):
+    products = {
+        product['id']: product
+        for product in Product.objects.filter(
+            id__in=totals.keys(), storage_id__in=storage_ids
+        ).values('id', 'title', 'quantity')
+    }
+
+    for product_id in totals:
+        if product_id not in products:
+            raise NotFound(f"Товар с ID {product_id} не найден")
+
+    lines = []
+    for product_id, quantity in totals.items():
+        product = products[product_id]
+        if product['quantity'] < quantity:
+            lines.append({
+                "product_id": product_id,
+                "requested": quantity,
+                "available": product['quantity'],
+                "detail": f"Недостаточно товара {product['title']}. "
+                          f"Доступно: {product['quantity']}, запрошено: {quantity}",
+            })
+
+    raise StockShortage({
+        "detail": "Недостаточно товара на складе" if lines else "Остаток изменился, повторите запрос",
+        "product_sales": lines,
+    })
+
+
+def reserve_stock(company, totals):
+    # Условный UPDATE вместо чтения остатка и записи: строка уменьшается, только если остатка хватает.
+    # Условия стоят на самой строке товара (storage_id, а не storage__company): JOIN Postgres превращает
+    # в id IN (подзапрос), и после ожидания чужой блокировки остаток в нём не перепроверяется.
+    storage_ids = _company_storage_ids(company)
+    products = Product.objects.filter(id__in=totals.keys(), storage_id__in=storage_ids)
+    try:
+        with transaction.atomic():
+            if len(totals) > 1:
+                # Строки блокируем в одном порядке, иначе встречные продажи нескольких товаров ловят deadlock
+                locked = products.select_for_update(of=('self',), no_key=True).order_by('id')
+                list(locked.values_list('id', flat=True))
+            reserved = products.filter(
+                quantity__gte=Case(
+                    *[When(id=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+                    output_field=PositiveIntegerField()
+                )
+            ).update(
+                quantity=_quantity_delta(totals, -1),
+                updated_at=timezone.now()
+            )
+            if reserved != len(totals):
+                raise _StockChanged
+    except (_StockChanged, IntegrityError):
+        # IntegrityError - сработало ограничение quantity >= 0 базы: остатка всё-таки не хватило
+        _report_stock_shortage(storage_ids, totals)
+
+
+def book_sale(company, buyer_name, sale_date, product_sales):
+    totals = _merge_lines(product_sales, 'product_id')
+
+    with transaction.atomic():
+        sale = Sale.objects.create(
+            buyer_name=buyer_name,
+            company=company,
+            sale_date=sale_date
+        )
+        ProductSale.objects.bulk_create([
+            ProductSale(sale=sale, product_id=line['product_id'], quantity=line['quantity'])
+            for line in product_sales
+        ])
+        # Остаток списываем в конце транзакции, чтобы строки товаров были заблокированы как можно меньше
+        reserve_stock(company, totals)
+        record_sale_stats(sale, [
+            {'product_id': product_id, 'quantity': quantity} for product_id, quantity in totals.items()
+        ])
+
+    return sale
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield dict(items[start:start + size])
+
+
+def ingest_supply(company, supplier, delivery_date, products, batch_size=500):
+    totals = dict(sorted(_merge_lines(products, 'product').items()))
+
+    with transaction.atomic():
+        # Порядок блокировок как у продажи: сначала товары по возрастанию id, затем статистика в том же порядке,
+        # иначе поставка и продажа (или две поставки) с общими товарами ловят deadlock.
+        # Принадлежность проверяем по заблокированным строкам, чтобы проверка и запись видели одни данные.
+        # FOR NO KEY UPDATE не конфликтует с блокировкой, которую берёт вставка строк продажи по внешнему ключу.
+        storage_ids = _company_storage_ids(company)
+        owners = dict(
+            Product.objects.select_for_update(of=('self',), no_key=True)
+            .filter(id__in=totals.keys()).order_by('id').values_list('id', 'storage_id')
+        )
+        for product_id in totals:
+            if product_id not in owners:
+                raise NotFound(f"Товар с ID {product_id} не найден")
+            if owners[product_id] not in storage_ids:
+                raise PermissionDenied("В списке есть товары, которые принадлежат другой компании")
+
+        for batch in _batches(totals.items(), batch_size):
+            Product.objects.filter(id__in=batch.keys()).update(
+                quantity=_quantity_delta(batch, 1),
+                updated_at=timezone.now()
+            )
+
+        supply = Supply.objects.create(
+            supplier=supplier,
+            delivery_date=delivery_date
+        )
+        SupplyProduct.objects.bulk_create([
+            SupplyProduct(supply=supply, product_id=line['product'], quantity=line['quantity'])
+            for line in products
+        ], batch_size=batch_size)
+        day = stats_day(delivery_date)
+        record_product_stats(
+            (product_id, company.id, day, 0, quantity) for product_id, quantity in totals.items()
+        )
+
+    return supply
+
+
+def delete_sale(sale):
+    with transaction.atomic():
+        record_sale_stats(sale, list(sale_lines(sale)), sign=-1)
+        sale.delete()
+
+
+def update_sale(sale, buyer_name, sale_date):
+    with transaction.atomic():
+        if stats_day(sale_date) != stats_day(sale.sale_date):
+            lines = list(sale_lines(sale))
+            record_sale_stats(sale, lines, sign=-1)
+            sale.sale_date = sale_date
+            record_sale_stats(sale, lines)
+
+        sale.buyer_name = buyer_name
+        sale.sale_date = sale_date
+        sale.save()
+    return sale
+
+
+def apply_product_batch(storage, create, update, delete, batch_size=500):
+    now = timezone.now()
+    fields = set()
+    for product, data in update:
+        for field, value in data.items():
+            setattr(product, field, value)
+        # bulk_update не проставляет auto_now
+        product.updated_at = now
+        fields.update(data)
+
+    with transaction.atomic():
+        if delete:
+            Product.objects.filter(pk__in=delete).delete()
+        updated = [product for product, _ in update]
+        if updated:
+            Product.objects.bulk_update(updated, [*sorted(fields), 'updated_at'], batch_size=batch_size)
+        created = Product.objects.bulk_create(
+            [Product(storage=storage, **data) for data in create],
+            batch_size=batch_size
+        )
+
+    return created, updated, delete
@@ -0,0 +1,51 @@
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ProductDailyStats, ProductSale
+
+STATS_BATCH_SIZE = 500
+
+
+def stats_day(value):
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+# rows: (product_id, company_id, day, sold, received), пишутся через INSERT ... ON CONFLICT пачками
+def record_product_stats(rows):
+    totals = {}
+    for product_id, company_id, day, sold, received in rows:
+        key = (product_id, company_id, day)
+        current = totals.get(key, (0, 0))
+        totals[key] = (current[0] + sold, current[1] + received)
+    if not totals:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(ProductDailyStats._meta.db_table)
+    # Строки статистики блокируются в порядке товаров, как и сами товары в services
+    items = [(*key, sold, received) for key, (sold, received) in sorted(totals.items())]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), STATS_BATCH_SIZE):
+            batch = items[start:start + STATS_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} (product_id, company_id, day, units_sold, units_received) "
+                f"VALUES {values} "
+                f"ON CONFLICT (product_id, day) DO UPDATE SET "
+                f"units_sold = {table}.units_sold + EXCLUDED.units_sold, "
+                f"units_received = {table}.units_received + EXCLUDED.units_received",
+                [value for item in batch for value in item]
+            )
+
+
+def sale_lines(sale):
+    return ProductSale.objects.filter(sale=sale).values('product_id').annotate(quantity=Sum('quantity'))
+
+
+def record_sale_stats(sale, lines, sign=1):
+    day = stats_day(sale.sale_date)
+    record_product_stats(
+        (line['product_id'], sale.company_id, day, sign * line['quantity'], 0) for line in lines
+    )
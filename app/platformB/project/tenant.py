@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+
+
+class TenantContext:
+    def __init__(self, user):
+        self.user = user
+        self.company_id = getattr(user, 'company_id', None)
+        self.is_company_owner = getattr(user, 'is_company_owner', False)
+
+    @cached_property
+    def company(self):
+        if self.company_id is None:
+            return None
+        return self.user.company
+
+    @cached_property
+    def storage(self):
+        if self.company is None:
+            return None
+        try:
+            return self.company.storage
+        except ObjectDoesNotExist:
+            return None
+
+    @property
+    def storage_id(self):
+        return self.storage.id if self.storage is not None else None
+
+    async def aget_storage_id(self):
+        return await sync_to_async(lambda: self.storage_id)()
+
+
+def get_tenant(request):
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None or tenant.user is not request.user:
+        tenant = TenantContext(request.user)
+        request.tenant = tenant
+    return tenant
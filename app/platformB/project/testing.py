@@ -0,0 +1,20 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    query_count_sizes = (1, 10, 50)
+
+    def assertConstantQueries(self, populate, render, sizes=None, using=DEFAULT_DB_ALIAS):
+        counts = {}
+        for size in sizes or self.query_count_sizes:
+            populate(size)
+            with CaptureQueriesContext(connections[using]) as context:
+                render()
+            counts[size] = len(context.captured_queries)
+
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"Количество запросов зависит от размера списка: {counts}"
+        )
+        return next(iter(counts.values()))
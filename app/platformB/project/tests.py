@@ -1,3 +1,763 @@
-from django.test import TestCase
+import io
+import json
+import zlib
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+from .models import Company, Storage, Supplier, Product, Sale, ProductSale, ProductDailyStats, IdempotencyKey
+from .authentication import TenantJWTAuthentication
+from .checks import check_api_cache, check_replica_stickiness_cache, check_revocation_cache
+from .management.commands.benchmark_json import EDGE_CASES
+from .renderers import ORJSONParser, ORJSONRenderer, orjson
+from .routers import ReplicaRouter, start_routing, stop_routing
+from .services import apply_product_batch
+from .testing import QueryCountMixin
+
+
+class TenantAPITestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='ACME', inn='7700000000')
+        cls.storage = Storage.objects.create(company=cls.company, address='Склад 1')
+        cls.user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='password',
+            company=cls.company, is_company_owner=True
+        )
+
+    def setUp(self):
+        # Закэшированные списки и версии компаний не должны переживать тест
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_product(self, title, quantity=0, sale_price='2.00'):
+        return Product.objects.create(
+            title=title,
+            purchase_price=Decimal('1.00'),
+            sale_price=Decimal(sale_price),
+            quantity=quantity,
+            storage=self.storage
+        )
+
+    def sell(self, *lines, buyer_name='Покупатель', sale_date='2025-01-01T10:00:00Z', **extra):
+        return self.client.post('/api/v1/sales/add/', {
+            'buyer_name': buyer_name,
+            'sale_date': sale_date,
+            'product_sales': [{'product_id': product.id, 'quantity': quantity} for product, quantity in lines],
+        }, format='json', **extra)
+
+
+class SaleCreateTests(TenantAPITestCase):
+    def test_books_sale_and_decrements_stock(self):
+        product = self.create_product('Яблоко', quantity=10)
+
+        response = self.sell((product, 3))
+
+        self.assertEqual(response.status_code, 201)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 7)
+
+    def test_rejects_non_positive_quantity(self):
+        product = self.create_product('Яблоко', quantity=10)
+
+        for quantity in (0, -5):
+            response = self.sell((product, quantity))
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('product_sales', response.data)
+
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_reports_shortage_with_numbers(self):
+        apple = self.create_product('Яблоко', quantity=2)
+        pear = self.create_product('Груша', quantity=10)
+
+        response = self.sell((apple, 5), (pear, 1))
+
+        self.assertEqual(response.status_code, 400)
+        [line] = response.data['product_sales']
+        self.assertEqual(line['product_id'], apple.id)
+        self.assertIs(type(line['requested']), int)
+        self.assertIs(type(line['available']), int)
+        self.assertEqual((line['requested'], line['available']), (5, 2))
+        pear.refresh_from_db()
+        self.assertEqual(pear.quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_stock_constraint_violation_is_reported_as_shortage(self):
+        product = self.create_product('Яблоко', quantity=10)
+
+        # Так выглядит гонка, в которой UPDATE упёрся в ограничение quantity >= 0
+        with mock.patch('django.db.models.query.QuerySet.update', side_effect=IntegrityError):
+            response = self.sell((product, 3))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_sales'], [])
+        self.assertFalse(Sale.objects.exists())
+
+    def test_rejects_product_of_another_company(self):
+        other = Company.objects.create(name='Other', inn='7700000001')
+        product = Product.objects.create(
+            title='Чужой', purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'), quantity=10,
+            storage=Storage.objects.create(company=other, address='Склад 2')
+        )
+
+        response = self.sell((product, 1))
+
+        self.assertEqual(response.status_code, 404)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 10)
+
+
+class SupplyCreateTests(TenantAPITestCase):
+    def supply(self, *lines):
+        supplier = Supplier.objects.get_or_create(company=self.company, title='Поставщик', inn='5000000000')[0]
+        return self.client.post('/api/v1/supplies/create/', {
+            'supplier': supplier.id,
+            'delivery_date': '2025-01-01T10:00:00Z',
+            'products': [{'product': product.id, 'quantity': quantity} for product, quantity in lines],
+        }, format='json')
+
+    def test_adds_stock_and_stats(self):
+        pear = self.create_product('Груша', quantity=1)
+        apple = self.create_product('Яблоко', quantity=2)
+
+        response = self.supply((apple, 5), (pear, 3), (apple, 1))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            {product.title: product.quantity for product in Product.objects.all()},
+            {'Груша': 4, 'Яблоко': 8}
+        )
+        self.assertEqual(
+            dict(ProductDailyStats.objects.values_list('product_id', 'units_received')),
+            {pear.id: 3, apple.id: 6}
+        )
+
+    def test_rejects_product_of_another_company(self):
+        own = self.create_product('Яблоко', quantity=2)
+        other = Company.objects.create(name='Other', inn='7700000001')
+        foreign = Product.objects.create(
+            title='Чужой', purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'), quantity=10,
+            storage=Storage.objects.create(company=other, address='Склад 2')
+        )
+
+        response = self.supply((own, 5), (foreign, 1))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(
+            dict(Product.objects.values_list('title', 'quantity')), {'Яблоко': 2, 'Чужой': 10}
+        )
+        self.assertFalse(ProductDailyStats.objects.exists())
+
+
+class SaleImportTests(TenantAPITestCase):
+    def upload(self, body, content_type, **extra):
+        response = self.client.generic('POST', '/api/v1/sales/import/', body, content_type=content_type, **extra)
+        report = b''.join(response.streaming_content) if response.streaming else b''
+        return response, [json.loads(line) for line in report.splitlines()]
+
+    def test_chunked_upload_without_content_length(self):
+        product = self.create_product('Яблоко', quantity=10)
+        body = json.dumps({
+            'buyer_name': 'Покупатель',
+            'sale_date': '2025-01-01T10:00:00Z',
+            'product_sales': [{'product_id': product.id, 'quantity': 2}],
+        }).encode() + b'\n'
+
+        # Так запрос приходит от nginx с proxy_request_buffering off: gunicorn уже снял chunked-кодирование
+        response, report = self.upload(
+            body, 'application/x-ndjson', CONTENT_LENGTH='', HTTP_TRANSFER_ENCODING='chunked'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in report], ['created'])
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 8)
+
+    def test_gzip_report_is_flushed_per_chunk(self):
+        product = self.create_product('Яблоко', quantity=10)
+        line = json.dumps({
+            'buyer_name': 'Покупатель',
+            'sale_date': '2025-01-01T10:00:00Z',
+            'product_sales': [{'product_id': product.id, 'quantity': 1}],
+        }) + '\n'
+
+        response = self.client.generic(
+            'POST', '/api/v1/sales/import/?chunk_size=1', (line * 3).encode(),
+            content_type='application/x-ndjson', HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        # Первая запись отчёта читается из первой порции, не дожидаясь конца потока
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        first = decompressor.decompress(next(iter(response.streaming_content)))
+        self.assertEqual(json.loads(first)['status'], 'created')
+
+    def test_database_error_is_not_echoed(self):
+        product = self.create_product('Яблоко', quantity=10)
+        body = json.dumps({
+            'buyer_name': 'Покупатель',
+            'sale_date': '2025-01-01T10:00:00Z',
+            'product_sales': [{'product_id': product.id, 'quantity': 1}],
+        }).encode()
+
+        error = DatabaseError('duplicate key value violates unique constraint "secret_idx"')
+        with mock.patch('project.imports.book_sale', side_effect=error), \
+                self.assertLogs('project.imports', level='ERROR'):
+            response, report = self.upload(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(report[0]['status'], 'error')
+        self.assertNotIn('secret_idx', json.dumps(report))
+
+    def test_rejects_upload_without_length(self):
+        response, _ = self.upload(b'', 'application/x-ndjson', CONTENT_LENGTH='')
+
+        self.assertEqual(response.status_code, 411)
+
+    def test_non_utf8_csv_ends_report_with_error(self):
+        product = self.create_product('Яблоко', quantity=10)
+        body = (
+            'ref,buyer_name,sale_date,product_id,quantity\n'
+            f'1,Покупатель,2025-01-01T10:00:00Z,{product.id},1\n'
+            f'2,Покупатель,2025-01-01T10:00:00Z,{product.id},1\n'
+        ).encode('utf-8') + f'3,Покупатель,2025-01-01T10:00:00Z,{product.id},1\n'.encode('cp1251')
+
+        response, report = self.upload(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        # Документ 2 мог продолжаться в нечитаемой строке, поэтому не применяется
+        self.assertEqual([result['status'] for result in report], ['created', 'error'])
+        self.assertEqual(report[-1]['line'], 3)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 9)
+
+
+class ListQueryCountTests(QueryCountMixin, TenantAPITestCase):
+    def get_list(self, url):
+        # Кэш списков сбросили бы on_commit-хуки, которых в TestCase нет
+        caches[settings.API_CACHE_ALIAS].clear()
+        response = self.client.get(url, {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_list(self):
+        def populate(size):
+            for i in range(Product.objects.count(), size):
+                self.create_product(f'Товар {i}', quantity=i)
+
+        self.assertConstantQueries(populate, lambda: self.get_list('/api/v1/products/list/'))
+
+    def test_sale_list(self):
+        products = [self.create_product(f'Товар {i}', quantity=100) for i in range(3)]
+
+        def populate(size):
+            for i in range(Sale.objects.count(), size):
+                sale = Sale.objects.create(
+                    company=self.company, buyer_name=f'Покупатель {i}', sale_date='2025-01-01T10:00:00Z'
+                )
+                ProductSale.objects.bulk_create(ProductSale(sale=sale, product=product, quantity=1) for product in products)
+
+        self.assertConstantQueries(populate, lambda: self.get_list('/api/v1/sales/list/'))
+
+
+class AuthenticationTests(TenantAPITestCase):
+    def get_with_token(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client.get('/api/v1/products/list/')
+
+    def test_loads_company_with_token(self):
+        self.assertEqual(self.get_with_token(self.user).status_code, 200)
+
+    def test_rejects_inactive_user(self):
+        user = User.objects.create_user(
+            username='fired', email='fired@example.com', password='password', company=self.company
+        )
+        token_user = User.objects.get(pk=user.pk)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+
+        self.assertEqual(self.get_with_token(token_user).status_code, 401)
+
+    def test_loads_user_company_and_storage_in_one_query(self):
+        token = AccessToken.for_user(self.user)
+
+        with self.assertNumQueries(1):
+            user = TenantJWTAuthentication().get_user(token)
+            self.assertEqual(user.company.storage, self.storage)
+
+    def test_rejects_token_issued_before_password_change(self):
+        # api_settings simplejwt импортирован модулями по имени, override_settings его не подменяет
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            token_user = User.objects.get(pk=self.user.pk)
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(token_user)}')
+            self.user.set_password('new-password')
+            self.user.save()
+
+            self.assertEqual(client.get('/api/v1/products/list/').status_code, 401)
+
+    @override_settings(JWT_STATELESS_AUTH=True)
+    def test_stateless_auth_requires_shared_cache(self):
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1'}
+
+        with override_settings(CACHES={'default': locmem, 'api': locmem}):
+            self.assertEqual([error.id for error in check_revocation_cache(None)], ['project.E001'])
+        with override_settings(CACHES={'default': redis, 'api': locmem}):
+            self.assertEqual(check_revocation_cache(None), [])
+
+
+class CacheCheckTests(TestCase):
+    locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+    def test_api_cache_in_locmem_fails_without_debug(self):
+        with override_settings(DEBUG=False, CACHES={'default': self.locmem, 'api': self.locmem}):
+            self.assertEqual([error.id for error in check_api_cache(None)], ['project.E002'])
+        with override_settings(DEBUG=True, CACHES={'default': self.locmem, 'api': self.locmem}):
+            self.assertEqual(check_api_cache(None), [])
+
+    def test_replica_stickiness_requires_shared_cache(self):
+        with override_settings(DEBUG=False, REPLICA_DATABASES=['replica_1'], CACHES={'default': self.locmem}):
+            self.assertEqual([error.id for error in check_replica_stickiness_cache(None)], ['project.E003'])
+        with override_settings(DEBUG=False, REPLICA_DATABASES=[], CACHES={'default': self.locmem}):
+            self.assertEqual(check_replica_stickiness_cache(None), [])
+
+    def test_disabled_api_cache_passes(self):
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(DEBUG=False, CACHES={'default': self.locmem, 'api': dummy}):
+            self.assertEqual(check_api_cache(None), [])
+
+
+
+class ReplicaRouterTests(TestCase):
+    @override_settings(REPLICA_DATABASES=['replica_1'])
+    def test_related_reads_follow_instance_database(self):
+        sale = Sale(buyer_name='Покупатель')
+        sale._state.db = 'replica_1'
+
+        # Так prefetch строк выгрузки запрашивает базу уже после выхода из ReplicaRoutingMiddleware
+        self.assertEqual(ReplicaRouter().db_for_read(ProductSale, instance=sale), 'replica_1')
+        token = start_routing(use_replica=False)
+        try:
+            self.assertEqual(ReplicaRouter().db_for_read(ProductSale, instance=sale), 'replica_1')
+            self.assertEqual(ReplicaRouter().db_for_read(ProductSale), 'default')
+        finally:
+            stop_routing(token)
+
+@skipIf(orjson is None, "orjson не установлен")
+class ORJSONCompatibilityTests(TestCase):
+    def test_renders_like_drf(self):
+        for name, value in EDGE_CASES.items():
+            with self.subTest(name):
+                self.assertEqual(ORJSONRenderer().render({name: value}), JSONRenderer().render({name: value}))
+
+    def test_parses_like_drf(self):
+        for name, value in EDGE_CASES.items():
+            with self.subTest(name):
+                content = JSONRenderer().render({name: value})
+                self.assertEqual(
+                    ORJSONParser().parse(io.BytesIO(content)),
+                    JSONParser().parse(io.BytesIO(content))
+                )
+
+    def test_rejects_non_finite_floats(self):
+        view = APIView()
+        view.renders_floats = True
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value):
+                for data in (value, {'results': [{'total': Decimal('1.00'), 'ratio': value}]}):
+                    with self.assertRaises(ValueError):
+                        JSONRenderer().render(data)
+                    for context in (None, {'view': view}):
+                        with self.assertRaises(ValueError):
+                            ORJSONRenderer().render(data, None, context)
+
+    def test_skips_float_scan_for_views_without_floats(self):
+        data = {'results': [{'id': 1, 'total': Decimal('1.00')}]}
+
+        with mock.patch('project.renderers._has_non_finite_float') as scan:
+            self.assertEqual(ORJSONRenderer().render(data, None, {'view': APIView()}), JSONRenderer().render(data))
+        scan.assert_not_called()
+
+    def test_float_format_differs_but_parses_equal(self):
+        data = {'value': 1e16}
+
+        self.assertEqual(JSONRenderer().render(data), b'{"value":1e+16}')
+        self.assertEqual(ORJSONRenderer().render(data), b'{"value":1e16}')
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), data)
+
+
+class ProductBatchTests(TenantAPITestCase):
+    def batch(self, **operations):
+        return self.client.post('/api/v1/products/batch/', operations, format='json')
+
+    def test_concurrent_duplicate_title_is_reported_per_operation(self):
+        def race(**batch):
+            # Параллельный запрос создал товар с тем же названием после проверки пакета
+            self.create_product('Груша')
+            return apply_product_batch(**batch)
+
+        with mock.patch('project.views.apply_product_batch', side_effect=race):
+            response = self.batch(create=[
+                {'title': 'Яблоко', 'purchase_price': '1.00', 'sale_price': '2.00'},
+                {'title': 'Груша', 'purchase_price': '1.00', 'sale_price': '2.00'},
+            ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'create': {'1': {'title': ["Продукт с таким названием уже существует"]}}})
+        self.assertEqual(list(Product.objects.values_list('title', flat=True)), ['Груша'])
+
+    def test_reports_bad_delete_id_with_other_operation_errors(self):
+        product = self.create_product('Яблоко')
+
+        response = self.batch(
+            create=[{'title': 'Груша', 'purchase_price': '1.00'}],
+            update=[{'id': product.id, 'sale_price': 'дорого'}],
+            delete=['x', product.id + 1000],
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(list(errors['create']['0']), ['sale_price'])
+        self.assertEqual(list(errors['update']['0']), ['sale_price'])
+        self.assertEqual(list(errors['delete']), ['0', '1'])
+        self.assertEqual(errors['delete']['1'], ["Продукт не найден"])
+
+    def test_unexplained_integrity_error_is_conflict(self):
+        with mock.patch('project.views.apply_product_batch', side_effect=IntegrityError):
+            response = self.batch(create=[{'title': 'Яблоко', 'purchase_price': '1.00', 'sale_price': '2.00'}])
+
+        self.assertEqual(response.status_code, 409)
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'api'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListCacheTests(TenantAPITestCase):
+    def titles(self, client=None):
+        response = (client or self.client).get('/api/v1/products/list/')
+        self.assertEqual(response.status_code, 200)
+        return [product['title'] for product in response.json()['results']], response['ETag']
+
+    def test_list_is_cached_until_company_writes(self):
+        product = self.create_product('Яблоко', quantity=10)
+        self.assertEqual(self.titles()[0], ['Яблоко'])
+
+        # Запись мимо API версию не сбрасывает, список отдаётся из кэша
+        self.create_product('Груша')
+        self.assertEqual(self.titles()[0], ['Яблоко'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.sell((product, 1)).status_code, 201)
+        self.assertEqual(self.titles()[0], ['Яблоко', 'Груша'])
+
+    def test_write_does_not_invalidate_other_company(self):
+        product = self.create_product('Яблоко', quantity=10)
+        other = Company.objects.create(name='Other', inn='7700000001')
+        other_storage = Storage.objects.create(company=other, address='Склад 2')
+        other_client = APIClient()
+        other_client.force_authenticate(User.objects.create_user(
+            username='other', email='other@example.com', password='password', company=other, is_company_owner=True
+        ))
+        Product.objects.create(
+            title='Чужой', purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'), storage=other_storage
+        )
+        self.assertEqual(self.titles(other_client)[0], ['Чужой'])
+
+        Product.objects.create(
+            title='Новый', purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'), storage=other_storage
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sell((product, 1))
+
+        self.assertEqual(self.titles(other_client)[0], ['Чужой'])
+
+    def test_if_none_match_returns_not_modified(self):
+        self.create_product('Яблоко')
+        _, etag = self.titles()
+
+        for header in (etag, f'W/{etag}'):
+            with self.subTest(header):
+                response = self.client.get('/api/v1/products/list/', HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/v1/products/list/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+
+class ConditionalRetrieveTests(TenantAPITestCase):
+    def test_not_modified_until_product_changes(self):
+        product = self.create_product('Яблоко')
+        url = f'/api/v1/products/{product.id}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        product.sale_price = Decimal('3.00')
+        product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['sale_price'], '3.00')
+
+    def test_etag_depends_on_fieldset(self):
+        product = self.create_product('Яблоко')
+        url = f'/api/v1/products/{product.id}/'
+        full = self.client.get(url)['ETag']
+
+        response = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=full)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': product.id})
+
+        partial = self.client.get(url, {'fields': 'title,id'})['ETag']
+        self.assertNotEqual(partial, full)
+        self.assertEqual(self.client.get(url, {'fields': 'id,title'}, HTTP_IF_NONE_MATCH=partial).status_code, 304)
+
+        response = self.client.get(f'/api/v1/storages/{self.storage.id}/', {'fields': 'id'})
+        self.assertNotEqual(
+            response['ETag'], self.client.get(f'/api/v1/storages/{self.storage.id}/')['ETag']
+        )
+
+    def test_not_found_for_another_company(self):
+        other = Company.objects.create(name='Other', inn='7700000001')
+        product = Product.objects.create(
+            title='Чужой', purchase_price=Decimal('1.00'), sale_price=Decimal('2.00'),
+            storage=Storage.objects.create(company=other, address='Склад 2')
+        )
+
+        self.assertEqual(self.client.get(f'/api/v1/products/{product.id}/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+
+class SaleStatsTests(TenantAPITestCase):
+    def units_sold(self):
+        return dict(ProductDailyStats.objects.values_list('day', 'units_sold'))
+
+    def test_sale_and_delete_update_daily_stats(self):
+        product = self.create_product('Яблоко', quantity=10)
+
+        self.sell((product, 3), (product, 1))
+        response = self.sell((product, 2))
+        self.assertEqual(self.units_sold(), {date(2025, 1, 1): 6})
+
+        self.assertEqual(self.client.delete(f"/api/v1/sales/{response.data['id']}/delete/").status_code, 204)
+        self.assertEqual(self.units_sold(), {date(2025, 1, 1): 4})
+
+    def test_redating_sale_moves_stats(self):
+        product = self.create_product('Яблоко', quantity=10)
+        sale_id = self.sell((product, 3)).data['id']
+
+        response = self.client.put(
+            f'/api/v1/sales/{sale_id}/update/', {'sale_date': '2025-01-05T10:00:00Z'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.units_sold(), {date(2025, 1, 1): 0, date(2025, 1, 5): 3})
+
+        # Смена времени внутри того же дня статистику не трогает
+        self.client.put(f'/api/v1/sales/{sale_id}/update/', {'sale_date': '2025-01-05T18:00:00Z'}, format='json')
+        self.assertEqual(self.units_sold(), {date(2025, 1, 1): 0, date(2025, 1, 5): 3})
+
+
+class SalesAnalyticsTests(TenantAPITestCase):
+    def test_totals_series_and_rank(self):
+        apple = self.create_product('Яблоко', quantity=10)
+        pear = self.create_product('Груша', quantity=10, sale_price='5.00')
+        self.sell((apple, 3), (pear, 1), sale_date='2025-01-01T10:00:00Z')
+        self.sell((apple, 1), sale_date='2025-01-02T10:00:00Z')
+
+        response = self.client.get('/api/v1/reports/sales/', {'bucket': 'day'})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['totals'], {'units': 5, 'revenue': '13.00', 'profit': '8.00'})
+        self.assertEqual(
+            [(row['units'], row['revenue'], row['cumulative_revenue']) for row in data['series']],
+            [(4, '11.00', '11.00'), (1, '2.00', '13.00')]
+        )
+        self.assertEqual(
+            [(row['rank'], row['title'], row['revenue']) for row in data['top_products']],
+            [(1, 'Яблоко', '8.00'), (2, 'Груша', '5.00')]
+        )
+
+    def test_date_range_and_top(self):
+        apple = self.create_product('Яблоко', quantity=10)
+        pear = self.create_product('Груша', quantity=10, sale_price='5.00')
+        self.sell((apple, 3), sale_date='2025-01-01T10:00:00Z')
+        self.sell((pear, 1), sale_date='2025-01-02T23:00:00Z')
+
+        response = self.client.get('/api/v1/reports/sales/', {'start_date': '2025-01-02', 'end_date': '2025-01-02', 'top': 1})
+
+        data = response.json()
+        self.assertEqual(data['totals']['units'], 1)
+        self.assertEqual([row['title'] for row in data['top_products']], ['Груша'])
+
+
+class SaleExportTests(TenantAPITestCase):
+    def export(self, **params):
+        response = self.client.get('/api/v1/sales/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_and_csv(self):
+        apple = self.create_product('Яблоко', quantity=10)
+        pear = self.create_product('Груша', quantity=10)
+        first = self.sell((apple, 2), (pear, 1), buyer_name='Иванов', sale_date='2025-01-02T10:00:00Z').data
+        second = self.sell((pear, 3), buyer_name='Петров', sale_date='2025-01-01T10:00:00Z').data
+
+        response, content = self.export(output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in content.splitlines()], [second, first])
+
+        response, content = self.export(output='csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="sales.csv"')
+        self.assertEqual(content.splitlines(), [
+            'id,buyer_name,sale_date,product_id,quantity',
+            f"{second['id']},Петров,2025-01-01T10:00:00Z,{pear.id},3",
+            f"{first['id']},Иванов,2025-01-02T10:00:00Z,{apple.id},2",
+            f"{first['id']},Иванов,2025-01-02T10:00:00Z,{pear.id},1",
+        ])
+
+    def test_date_range(self):
+        product = self.create_product('Яблоко', quantity=10)
+        self.sell((product, 1), sale_date='2025-01-01T10:00:00Z')
+        sale = self.sell((product, 1), sale_date='2025-01-02T10:00:00Z').data
+
+        _, content = self.export(start_date='2025-01-02T00:00:00Z')
+
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [sale['id']])
+
+
+class IdempotencyTests(TenantAPITestCase):
+    def test_replays_saved_response(self):
+        product = self.create_product('Яблоко', quantity=10)
+
+        first = self.sell((product, 3), HTTP_IDEMPOTENCY_KEY='sale-1')
+        second = self.sell((product, 3), HTTP_IDEMPOTENCY_KEY='sale-1')
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.count(), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 7)
+
+    def test_rejects_key_reused_with_other_body(self):
+        product = self.create_product('Яблоко', quantity=10)
+        self.sell((product, 3), HTTP_IDEMPOTENCY_KEY='sale-1')
+
+        response = self.sell((product, 4), HTTP_IDEMPOTENCY_KEY='sale-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_failed_request_does_not_store_key(self):
+        product = self.create_product('Яблоко', quantity=1)
+
+        self.assertEqual(self.sell((product, 3), HTTP_IDEMPOTENCY_KEY='sale-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Повтор с тем же ключом после пополнения выполняется заново
+        Product.objects.filter(pk=product.pk).update(quantity=10)
+        response = self.sell((product, 3), HTTP_IDEMPOTENCY_KEY='sale-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+
+class ListFilterTests(TenantAPITestCase):
+    def collect(self, url, params, key='title'):
+        values = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            values += [item[key] for item in data['results']]
+            if not data['next']:
+                return values
+            response = self.client.get(data['next'])
+
+    def test_product_filters_and_ordering_across_pages(self):
+        for title, price in [('Яблоко красное', '3.00'), ('Груша', '9.00'), ('Яблоко зелёное', '2.00'),
+                             ('Яблоко жёлтое', '3.00'), ('Яблоко дорогое', '50.00')]:
+            self.create_product(title, sale_price=price)
+
+        titles = self.collect('/api/v1/products/list/', {
+            'title__istartswith': 'Ябл', 'sale_price__lte': '10', 'ordering': '-sale_price', 'page_size': 1
+        })
+
+        # Одинаковые цены упорядочены по id по убыванию, курсор не теряет и не повторяет строки
+        self.assertEqual(titles, ['Яблоко жёлтое', 'Яблоко красное', 'Яблоко зелёное'])
+
+    def test_sale_filter_by_product_and_date(self):
+        apple = self.create_product('Яблоко', quantity=100)
+        pear = self.create_product('Груша', quantity=100)
+        for day in range(1, 5):
+            self.sell((apple, 1), (apple, 1), buyer_name=f'Покупатель {day}', sale_date=f'2025-01-0{day}T10:00:00Z')
+        self.sell((pear, 1), buyer_name='Без яблок', sale_date='2025-01-03T10:00:00Z')
+
+        buyers = self.collect('/api/v1/sales/list/', {
+            'product': apple.id, 'start_date': '2025-01-02T00:00:00Z', 'ordering': '-sale_date', 'page_size': 2
+        }, key='buyer_name')
+
+        self.assertEqual(buyers, ['Покупатель 4', 'Покупатель 3', 'Покупатель 2'])
+
+    def test_ignores_unknown_ordering_field(self):
+        self.create_product('Яблоко')
+        self.create_product('Груша')
+
+        response = self.client.get('/api/v1/products/list/', {'ordering': 'quantity'})
+
+        # Поле вне ordering_fields игнорируется, остаётся сортировка по умолчанию
+        self.assertEqual([product['title'] for product in response.json()['results']], ['Яблоко', 'Груша'])
+
+
+class FieldsetTests(TenantAPITestCase):
+    def test_selects_fields_and_expands_children(self):
+        product = self.create_product('Яблоко', quantity=10)
+        sale_id = self.sell((product, 2)).data['id']
+
+        response = self.client.get(f'/api/v1/products/{product.id}/', {'fields': 'id,title'})
+        self.assertEqual(response.json(), {'id': product.id, 'title': 'Яблоко'})
+
+        response = self.client.get('/api/v1/sales/list/', {'fields': 'id', 'expand': 'product_sales'})
+        self.assertEqual(
+            response.json()['results'], [{'id': sale_id, 'product_sales': [{'product_id': product.id, 'quantity': 2}]}]
+        )
+
+        response = self.client.get(f'/api/v1/sales/{sale_id}/', {'fields': 'buyer_name'})
+        self.assertEqual(response.json(), {'buyer_name': 'Покупатель'})
+
+    def test_rejects_unknown_fields(self):
+        product = self.create_product('Яблоко')
+
+        response = self.client.get(f'/api/v1/products/{product.id}/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'][0])
+
+        response = self.client.get('/api/v1/products/list/', {'expand': 'storage'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expand', response.json())
@@ -1,7 +1,17 @@
+from django.conf import settings
 from django.urls import path, include
 
 from .views import *
 
+# В ASGI-режиме списки и карточки отдаются асинхронными версиями представлений
+if settings.ASYNC_READ_VIEWS:
+    from .async_views import AsyncCompanyRetrieveAPIView as CompanyRetrieveAPIView, \
+        AsyncStorageRetrieveAPIView as StorageRetrieveAPIView, \
+        AsyncSupplierListAPIView as SupplierListAPIView, \
+        AsyncProductListAPIView as ProductListAPIView, \
+        AsyncSupplyListAPIView as SupplyListAPIView, \
+        AsyncSaleListAPIView as SaleListAPIView
+
 urlpatterns = [
     path('companies/<int:pk>/', CompanyRetrieveAPIView.as_view(), name='company-retrieve'),
     path('companies/create/', CompanyCreateAPIView.as_view(), name='company-create'),
@@ -20,14 +30,24 @@ urlpatterns = [
 
     path('products/list/', ProductListAPIView.as_view(), name='products-list'),
     path('products/add/', ProductCreateAPIView.as_view(), name='product-add'),
+    path('products/batch/', ProductBatchAPIView.as_view(), name='product-batch'),
+    path('products/<int:pk>/', ProductRetrieveAPIView.as_view(), name='product-retrieve'),
     path('products/<int:pk>/update/', ProductUpdateAPIView.as_view(), name='product-update'),
     path('products/<int:pk>/delete/', ProductDestroyAPIView.as_view(), name='product-delete'),
 
     path('supplies/list/', SupplyListAPIView.as_view(), name='supply-list'),
     path('supplies/create/', SupplyCreateAPIView.as_view(), name='supply-add'),
+    path('supplies/import/', SupplyImportAPIView.as_view(), name='supply-import'),
+    path('supplies/export/', SupplyExportAPIView.as_view(), name='supply-export'),
 
     path('sales/list/', SaleListAPIView.as_view(), name='sales-list'),
     path('sales/add/', SaleCreateAPIView.as_view(), name='sale-add'),
+    path('sales/import/', SaleImportAPIView.as_view(), name='sale-import'),
+    path('sales/export/', SaleExportAPIView.as_view(), name='sale-export'),
+    path('sales/<int:pk>/', SaleRetrieveAPIView.as_view(), name='sale-retrieve'),
     path('sales/<int:pk>/update/', SaleUpdateAPIView.as_view(), name='sale-update'),
     path('sales/<int:pk>/delete/', SaleDestroyAPIView.as_view(), name='sale-delete'),
+
+    path('reports/products/', ProductStatsAPIView.as_view(), name='report-products'),
+    path('reports/sales/', SalesAnalyticsAPIView.as_view(), name='report-sales'),
 ]
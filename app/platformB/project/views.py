@@ -1,16 +1,37 @@
 from itertools import product
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, router
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Company, Storage, Supplier, Product, Supply, SupplyProduct, Sale, ProductSale
+from .models import Company, Storage, Supplier, Product, Supply, Sale, ProductDailyStats
 from .serializer import CompanySerializer, StorageSerializer, StorageDetailSerializer, SupplierSerializer, \
-    ProductSerializer, SupplySerializer, SaleSerializer, SaleUpdateSerializer
+    ProductSerializer, SupplySerializer, SupplyItemSerializer, SaleSerializer, SaleUpdateSerializer, \
+    ProductStatsQuerySerializer, ProductStatsSerializer, SalesAnalyticsQuerySerializer, SalesAnalyticsSerializer, \
+    ExportQuerySerializer, ProductBatchSerializer
 from .permissions import IsCompanyOwnerOrReadOnly, IsRelatedToCompany
+from .services import ingest_supply, update_sale, delete_sale, apply_product_batch
+from .analytics import sales_analytics
+from .imports import SaleImporter, SupplyImporter, get_upload_stream
+from .exports import SaleExporter, SupplyExporter
+from .representations import CompanyValuesSerializer, StorageValuesSerializer, SupplierValuesSerializer, \
+    ProductValuesSerializer, SupplyValuesSerializer, SaleValuesSerializer, FIELDSET_PARAMETERS
+from .pagination import KeysetPagination, SupplyPagination, SalePagination
+from .filters import FILTER_BACKENDS, ProductFilter, SaleFilter, filter_queryset
+from .tenant import get_tenant
+from .idempotency import idempotent, IDEMPOTENCY_PARAMETER
+from .authentication import invalidate_tenant_claims
+from .cache import cache_company_response, invalidate_company_cache, get_not_modified_response, \
+    set_version_headers
+
+User = get_user_model()
 
 
 class CompanyRetrieveAPIView(APIView):
@@ -19,16 +40,26 @@ class CompanyRetrieveAPIView(APIView):
     @extend_schema(
         tags=['company'],
         description="Получение компании по ID. Доступно всем авторизованным пользователям.",
-        request=CompanySerializer
+        request=CompanySerializer,
+        parameters=FIELDSET_PARAMETERS
     )
     def get(self, request, pk):
-        try:
-            company = Company.objects.get(pk=pk)
-            serializer = CompanySerializer(company)
-            return Response(serializer.data)
-        except Company.DoesNotExist:
+        fieldset = CompanyValuesSerializer.get_fieldset(request)
+
+        updated_at = Company.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        if updated_at is None:
             return Response({"detail": "Компания не найдена"}, status=status.HTTP_404_NOT_FOUND)
 
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = CompanyValuesSerializer.retrieve(Company.objects.filter(pk=pk), fieldset, extra=['updated_at'])
+        if row is None:
+            return Response({"detail": "Компания не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
+
 
 class CompanyCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyOwnerOrReadOnly]
@@ -39,16 +70,15 @@ class CompanyCreateAPIView(APIView):
         request=CompanySerializer
     )
     def post(self, request):
-        if request.user.company is not None:
+        if get_tenant(request).company_id is not None:
             return Response({"detail": "У Вас уже есть компания"}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = CompanySerializer(data=request.data)
         if serializer.is_valid():
             company = serializer.save()
 
-            request.user.is_company_owner = True
-            request.user.company = company
-            request.user.save()
+            User.objects.filter(pk=request.user.pk).update(is_company_owner=True, company=company)
+            invalidate_tenant_claims(request.user.pk)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -63,18 +93,19 @@ class CompanyDestroyAPIView(APIView):
         request=CompanySerializer
     )
     def delete(self, request):
-        company = request.user.company
+        tenant = get_tenant(request)
+        company = tenant.company
 
-        if not request.user.is_company_owner:
+        if not tenant.is_company_owner:
             return Response({
                 "detail": "Вы не являетесь владельцем этой компании"
             }, status=status.HTTP_403_FORBIDDEN)
 
+        members = list(User.objects.filter(company=company).values_list('pk', flat=True))
         company.delete()
 
-        request.user.is_company_owner = False
-        request.user.company = None
-        request.user.save()
+        User.objects.filter(pk=request.user.pk).update(is_company_owner=False, company=None)
+        invalidate_tenant_claims(request.user.pk, *members)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -87,9 +118,10 @@ class CompanyUpdateAPIView(APIView):
         request=CompanySerializer
     )
     def put(self, request):
-        company = request.user.company
+        tenant = get_tenant(request)
+        company = tenant.company
 
-        if not request.user.is_company_owner:
+        if not tenant.is_company_owner:
             return Response({
                 "detail": "У вас нет прав на изменение компании"
             }, status=status.HTTP_403_FORBIDDEN)
@@ -114,22 +146,32 @@ class StorageRetrieveAPIView(APIView):
     @extend_schema(
         tags=['storage'],
         description="Получение склада по ID. Доступно пользователям, связанным с компанией склада.",
-        request=StorageDetailSerializer
+        request=StorageDetailSerializer,
+        parameters=FIELDSET_PARAMETERS
     )
     def get(self, request, pk):
+        fieldset = StorageValuesSerializer.get_fieldset(request)
+
         try:
-            storage = Storage.objects.get(pk=pk)
+            company_id, updated_at = Storage.objects.values_list('company_id', 'updated_at').get(pk=pk)
+        except Storage.DoesNotExist:
+            return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
 
-            if not (request.user.company == storage.company):
-                return Response({
-                    "detail": "У вас нет доступа к этому складу"
-                }, status=status.HTTP_403_FORBIDDEN)
+        if company_id != get_tenant(request).company_id:
+            return Response({
+                "detail": "У вас нет доступа к этому складу"
+            }, status=status.HTTP_403_FORBIDDEN)
 
-            serializer = StorageDetailSerializer(storage)
-            return Response(serializer.data)
-        except Storage.DoesNotExist:
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = StorageValuesSerializer.retrieve(Storage.objects.filter(pk=pk), fieldset, extra=['updated_at'])
+        if row is None:
             return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
 
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
+
 
 class StorageCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyOwnerOrReadOnly]
@@ -140,14 +182,16 @@ class StorageCreateAPIView(APIView):
         request=StorageSerializer
     )
     def post(self, request):
-        if not request.user.is_company_owner:
+        tenant = get_tenant(request)
+        if not tenant.is_company_owner:
             return Response({
                 "detail": "Только владелец компании может создавать склады"
             }, status=status.HTTP_403_FORBIDDEN)
 
         serializer = StorageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(company=request.user.company)
+            serializer.save(company=tenant.company)
+            invalidate_company_cache(tenant.company_id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -164,7 +208,8 @@ class StorageUpdateAPIView(APIView):
         try:
             storage = Storage.objects.get(pk=pk)
 
-            if not (request.user.is_company_owner and request.user.company == storage.company):
+            tenant = get_tenant(request)
+            if not (tenant.is_company_owner and tenant.company_id == storage.company_id):
                 return Response({
                     "detail": "Только владелец компании может изменять склад"
                 }, status=status.HTTP_403_FORBIDDEN)
@@ -194,12 +239,14 @@ class StorageDestroyAPIView(APIView):
         try:
             storage = Storage.objects.get(pk=pk)
 
-            if not (request.user.is_company_owner and request.user.company == storage.company):
+            tenant = get_tenant(request)
+            if not (tenant.is_company_owner and tenant.company_id == storage.company_id):
                 return Response({
                     "detail": "Только владелец компании может удалять склад"
                 }, status=status.HTTP_403_FORBIDDEN)
 
             storage.delete()
+            invalidate_company_cache(tenant.company_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Storage.DoesNotExist:
             return Response({"detail": "Склад не найден"}, status=status.HTTP_404_NOT_FOUND)
@@ -210,15 +257,18 @@ class StorageDestroyAPIView(APIView):
 
 class SupplierListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = KeysetPagination
 
     @extend_schema(
         tags=['supplier'],
-        description="Получение списка поставщиков компании"
+        description="Получение списка поставщиков компании",
+        parameters=FIELDSET_PARAMETERS
     )
+    @cache_company_response
     def get(self, request):
-        suppliers = Supplier.objects.filter(company=request.user.company)
-        serializer = SupplierSerializer(suppliers, many=True)
-        return Response(serializer.data)
+        suppliers = Supplier.objects.filter(company_id=get_tenant(request).company_id)
+
+        return self.pagination_class().paginate_values(SupplierValuesSerializer, suppliers, request, view=self)
 
 
 class SupplierCreateAPIView(APIView):
@@ -230,12 +280,14 @@ class SupplierCreateAPIView(APIView):
         request=SupplierSerializer
     )
     def post(self, request):
+        tenant = get_tenant(request)
         request_data = request.data.copy()
-        request_data['company'] = request.user.company.id
+        request_data['company'] = tenant.company_id
 
         serializer = SupplierSerializer(data=request_data)
         if serializer.is_valid():
-            serializer.save(company=request.user.company)
+            serializer.save(company=tenant.company)
+            invalidate_company_cache(tenant.company_id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -250,7 +302,7 @@ class SupplierUpdateAPIView(APIView):
     )
     def put(self, request, pk):
         try:
-            supplier = Supplier.objects.get(pk=pk, company=request.user.company)
+            supplier = Supplier.objects.get(pk=pk, company_id=get_tenant(request).company_id)
 
             serializer = SupplierSerializer(
                 supplier,
@@ -259,6 +311,7 @@ class SupplierUpdateAPIView(APIView):
             )
             if serializer.is_valid():
                 serializer.save()
+                invalidate_company_cache(supplier.company_id)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Supplier.DoesNotExist:
@@ -275,8 +328,9 @@ class SupplierDestroyAPIView(APIView):
     )
     def delete(self, request, pk):
         try:
-            supplier = Supplier.objects.get(pk=pk)
+            supplier = Supplier.objects.get(pk=pk, company_id=get_tenant(request).company_id)
             supplier.delete()
+            invalidate_company_cache(supplier.company_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Supplier.DoesNotExist:
             return Response(
@@ -297,40 +351,76 @@ class ProductCreateAPIView(APIView):
         request=ProductSerializer
     )
     def post(self, request):
-        try:
-            user_company = request.user.company
-            storage = Storage.objects.get(company=user_company)
-
-            request_data = request.data.copy()
-            request_data['storage'] = storage.id
-
-            serializer = ProductSerializer(data=request_data)
-            if serializer.is_valid():
-                serializer.save(storage=storage)
-                print(serializer.data)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Storage.DoesNotExist:
+        storage = get_tenant(request).storage
+        if storage is None:
             return Response(
                 {"detail": "У вашей компании ещё нет склада, чтобы добавить продукт"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        request_data = request.data.copy()
+        request_data['storage'] = storage.id
+
+        serializer = ProductSerializer(data=request_data)
+        if serializer.is_valid():
+            serializer.save(storage=storage)
+            invalidate_company_cache(storage.company_id)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
 class ProductListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = KeysetPagination
+    filter_backends = FILTER_BACKENDS
+    filterset_class = ProductFilter
+    ordering_fields = ['id', 'title', 'sale_price']
 
     @extend_schema(
         tags=['product'],
-        description="Получение списка продуктов компании"
+        description="Получение списка продуктов компании. "
+                    "Фильтры: title__icontains, title__istartswith, purchase_price__gte/lte, sale_price__gte/lte, "
+                    "quantity__lte; сортировка ordering=id|title|sale_price (с минусом — по убыванию)",
+        parameters=FIELDSET_PARAMETERS
     )
+    @cache_company_response
     def get(self, request):
-        user_company = request.user.company
-        storage = Storage.objects.get(company=user_company)
+        storage = get_tenant(request).storage
+        if storage is None:
+            return Response({"detail": "У вашей компании ещё нет склада"}, status=status.HTTP_404_NOT_FOUND)
 
-        products = Product.objects.filter(storage=storage)
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        products = filter_queryset(request, Product.objects.filter(storage=storage), self)
+
+        return self.pagination_class().paginate_values(ProductValuesSerializer, products, request, view=self)
+
+
+class ProductRetrieveAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    # Остаток смотрят перед продажей, поэтому читаем без задержки репликации
+    use_primary_db = True
+
+    @extend_schema(
+        tags=['product'],
+        description="Получение продукта по ID",
+        parameters=FIELDSET_PARAMETERS
+    )
+    def get(self, request, pk):
+        fieldset = ProductValuesSerializer.get_fieldset(request)
+        products = Product.objects.filter(pk=pk, storage__company_id=get_tenant(request).company_id)
+
+        updated_at = products.values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return Response({"detail": "Продукт не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = ProductValuesSerializer.retrieve(products, fieldset, extra=['updated_at'])
+        if row is None:
+            return Response({"detail": "Продукт не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
 
 
 class ProductUpdateAPIView(APIView):
@@ -343,7 +433,8 @@ class ProductUpdateAPIView(APIView):
     )
     def put(self, request, pk):
         try:
-            product = Product.objects.get(pk=pk)
+            tenant = get_tenant(request)
+            product = Product.objects.get(pk=pk, storage__company_id=tenant.company_id)
 
             serializer = ProductSerializer(
                 product,
@@ -352,7 +443,9 @@ class ProductUpdateAPIView(APIView):
             )
             if serializer.is_valid():
                 serializer.save()
+                invalidate_company_cache(tenant.company_id)
                 return Response(serializer.data)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Product.DoesNotExist:
             return Response({"detail": "Продукт не найден"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -367,8 +460,10 @@ class ProductDestroyAPIView(APIView):
     )
     def delete(self, request, pk):
         try:
-            product = Product.objects.get(pk=pk)
+            tenant = get_tenant(request)
+            product = Product.objects.get(pk=pk, storage__company_id=tenant.company_id)
             product.delete()
+            invalidate_company_cache(tenant.company_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Product.DoesNotExist:
             return Response(
@@ -377,6 +472,52 @@ class ProductDestroyAPIView(APIView):
             )
 
 
+class ProductBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+
+    @extend_schema(
+        tags=['product'],
+        description="Пакетное создание, изменение и удаление товаров в одной транзакции. "
+                    "Если хотя бы одна операция не прошла проверку, ничего не записывается, "
+                    "а ошибки возвращаются по индексам операций.",
+        request=ProductBatchSerializer,
+        parameters=[IDEMPOTENCY_PARAMETER]
+    )
+    @idempotent('product-batch')
+    def post(self, request):
+        tenant = get_tenant(request)
+        serializer = ProductBatchSerializer(data=request.data, context={'company_id': tenant.company_id})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        batch = serializer.validated_data
+        storage = tenant.storage
+        if batch['create'] and storage is None:
+            return Response(
+                {"detail": "У вашей компании ещё нет склада, чтобы добавить продукт"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            created, updated, deleted = apply_product_batch(storage=storage, **batch)
+        except IntegrityError:
+            # Название успел занять параллельный запрос уже после проверки пакета
+            errors = serializer.get_title_errors()
+            if errors:
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"detail": "Пакет конфликтует с параллельным изменением, повторите запрос"},
+                status=status.HTTP_409_CONFLICT
+            )
+        invalidate_company_cache(tenant.company_id)
+
+        return Response({
+            "created": ProductSerializer(created, many=True).data,
+            "updated": ProductSerializer(updated, many=True).data,
+            "deleted": deleted,
+        })
+
+
 #################################SUPLY####################################
 
 
@@ -386,8 +527,10 @@ class SupplyCreateAPIView(APIView):
     @extend_schema(
         tags=['supply'],
         description="Создание новой поставки товаров",
-        request=SupplySerializer
+        request=SupplySerializer,
+        parameters=[IDEMPOTENCY_PARAMETER]
     )
+    @idempotent('supply-create')
     def post(self, request):
         serializer = SupplySerializer(data=request.data)
         if not serializer.is_valid():
@@ -404,61 +547,134 @@ class SupplyCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if supplier.company != request.user.company:
+        tenant = get_tenant(request)
+        if supplier.company_id != tenant.company_id:
             return Response(
                 {"detail": "Поставщик принадлежит другой компании"},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        supply = Supply.objects.create(
+        items = SupplyItemSerializer(data=products_data, many=True)
+        if not items.is_valid():
+            return Response({"products": items.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        supply = ingest_supply(
+            company=tenant.company,
             supplier=supplier,
-            delivery_date=delivery_date
+            delivery_date=delivery_date,
+            products=items.validated_data
         )
 
-        for product_data in products_data:
-            product_id = product_data.get('product')
-            quantity = product_data.get('quantity')
+        invalidate_company_cache(tenant.company_id)
 
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
-                return Response(
-                    {"detail": f"Товар с ID {product_id} не найден"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        supply = SupplySerializer.setup_eager_loading(Supply.objects).get(id=supply.id)
+        serializer = SupplySerializer(supply)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-            if product.storage.company != request.user.company:
+
+class BaseImportAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    importer_class = None
+
+    def post(self, request):
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', settings.IMPORT_CHUNK_SIZE))
+        except ValueError:
+            chunk_size = settings.IMPORT_CHUNK_SIZE
+        chunk_size = min(max(chunk_size, 1), settings.IMPORT_MAX_CHUNK_SIZE)
+
+        stream = get_upload_stream(request)
+        if stream is None:
+            if not request.META.get('CONTENT_LENGTH'):
                 return Response(
-                    {"detail": "В списке есть товары, которые принадлежат другой компании"},
-                    status=status.HTTP_403_FORBIDDEN
+                    {"detail": "Требуется Content-Length или Transfer-Encoding: chunked"},
+                    status=status.HTTP_411_LENGTH_REQUIRED
                 )
+            return Response({"detail": "Пустое тело запроса"}, status=status.HTTP_400_BAD_REQUEST)
 
-            SupplyProduct.objects.create(
-                supply=supply,
-                product=product,
-                quantity=quantity
-            )
+        importer = self.importer_class(request)
+        records = importer.read(stream, request.content_type)
+        return StreamingHttpResponse(
+            importer.run(records, chunk_size),
+            content_type='application/x-ndjson'
+        )
 
-            product.quantity += quantity
-            product.save()
 
-        supply = Supply.objects.prefetch_related('supplyproduct_set').get(id=supply.id)
-        serializer = SupplySerializer(supply)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+class SupplyImportAPIView(BaseImportAPIView):
+    importer_class = SupplyImporter
+
+    @extend_schema(
+        tags=['supply'],
+        description="Массовый импорт поставок из потока NDJSON или CSV (ref, supplier, delivery_date, product, quantity)"
+    )
+    def post(self, request):
+        return super().post(request)
+
+
+class BaseExportAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    exporter_class = None
+    date_field = None
+    filename = None
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    def get(self, request):
+        query = ExportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        queryset = self.get_queryset(request)
+        if 'start_date' in params:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': params['start_date']})
+        if 'end_date' in params:
+            queryset = queryset.filter(**{f'{self.date_field}__lte': params['end_date']})
+        queryset = queryset.order_by(self.date_field, 'id')
+        # Тело читается уже после выхода из ReplicaRoutingMiddleware, поэтому базу выбираем сейчас
+        queryset = queryset.using(router.db_for_read(queryset.model))
+
+        output = params['output']
+        exporter = self.exporter_class(queryset, settings.EXPORT_CHUNK_SIZE)
+
+        # Сжатие по Accept-Encoding выполняет CompressionMiddleware
+        response = StreamingHttpResponse(exporter.stream(output), content_type=exporter.content_types[output])
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{output}"'
+        return response
+
+
+class SupplyExportAPIView(BaseExportAPIView):
+    exporter_class = SupplyExporter
+    date_field = 'delivery_date'
+    filename = 'supplies'
+
+    def get_queryset(self, request):
+        return Supply.objects.filter(supplier__company_id=get_tenant(request).company_id)
+
+    @extend_schema(
+        tags=['supply'],
+        description="Потоковая выгрузка поставок в CSV или NDJSON",
+        parameters=[ExportQuerySerializer]
+    )
+    def get(self, request):
+        return super().get(request)
 
 
 class SupplyListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsRelatedToCompany]
+    pagination_class = SupplyPagination
 
     @extend_schema(
         tags=['supply'],
-        description="Получение списка поставок компании"
+        description="Получение списка поставок компании",
+        parameters=FIELDSET_PARAMETERS
     )
+    @cache_company_response
     def get(self, request):
-        supplies = Supply.objects.filter(supplier__company=request.user.company).order_by('delivery_date')
+        supplies = Supply.objects.filter(supplier__company_id=get_tenant(request).company_id)
 
-        serializer = SupplySerializer(supplies, many=True)
-        return Response(serializer.data)
+        return self.pagination_class().paginate_values(SupplyValuesSerializer, supplies, request, view=self)
 
 
 class SaleCreateAPIView(APIView):
@@ -467,8 +683,10 @@ class SaleCreateAPIView(APIView):
     @extend_schema(
         tags=['sales'],
         description="Создание новой продажи",
-        request=SaleSerializer
+        request=SaleSerializer,
+        parameters=[IDEMPOTENCY_PARAMETER]
     )
+    @idempotent('sale-create')
     def post(self, request):
         serializer = SaleSerializer(data=request.data, context={'request': request})
 
@@ -481,75 +699,87 @@ class SaleCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        products_info = []
-        for product_sale in serializer.validated_data['product_sales']:
-            product_id = product_sale['product_id']
-            quantity = product_sale['quantity']
-
-            try:
-                product = Product.objects.get(id=product_id)
-                if product.quantity < quantity:
-                    return Response(
-                        {
-                            "detail": f"Недостаточно товара {product.title}. Доступно: {product.quantity}, запрошено: {quantity}"
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                products_info.append((product, quantity))
-            except Product.DoesNotExist:
-                return Response(
-                    {"detail": f"Товар с ID {product_id} не найден"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        # Нехватку остатка сервис отдаёт как StockShortage (400), прочие ошибки базы - обычный 500 без текста SQL
+        sale = serializer.save()
+        invalidate_company_cache(sale.company_id)
 
-        try:
-            sale = Sale.objects.create(
-                buyer_name=serializer.validated_data['buyer_name'],
-                company=request.user.company,
-                sale_date=serializer.validated_data['sale_date']
-            )
+        serializer = SaleSerializer(sale)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-            for product, quantity in products_info:
-                ProductSale.objects.create(
-                    sale=sale,
-                    product=product,
-                    quantity=quantity
-                )
-                product.quantity -= quantity
-                product.save()
 
-            serializer = SaleSerializer(sale)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+class SaleImportAPIView(BaseImportAPIView):
+    importer_class = SaleImporter
 
-        except Exception as e:
-            return Response(
-                {"detail": str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    @extend_schema(
+        tags=['sales'],
+        description="Массовый импорт продаж из потока NDJSON или CSV (ref, buyer_name, sale_date, product_id, quantity)"
+    )
+    def post(self, request):
+        return super().post(request)
+
+
+class SaleExportAPIView(BaseExportAPIView):
+    exporter_class = SaleExporter
+    date_field = 'sale_date'
+    filename = 'sales'
+
+    def get_queryset(self, request):
+        return Sale.objects.filter(company_id=get_tenant(request).company_id)
+
+    @extend_schema(
+        tags=['sales'],
+        description="Потоковая выгрузка продаж в CSV или NDJSON",
+        parameters=[ExportQuerySerializer]
+    )
+    def get(self, request):
+        return super().get(request)
 
 
 class SaleListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsRelatedToCompany]
-    pagination_class = PageNumberPagination
+    pagination_class = SalePagination
+    filter_backends = FILTER_BACKENDS
+    filterset_class = SaleFilter
+    ordering_fields = ['sale_date', 'id']
 
     @extend_schema(
         tags=['sales'],
-        description="Получение списка продаж"
+        description="Получение списка продаж. "
+                    "Фильтры: buyer_name__icontains, buyer_name__istartswith, product, start_date, end_date; "
+                    "сортировка ordering=sale_date|id (с минусом — по убыванию)",
+        parameters=FIELDSET_PARAMETERS
     )
     def get(self, request):
-        company = request.user.company
-        queryset = Sale.objects.filter(company=company)
+        queryset = filter_queryset(request, Sale.objects.filter(company_id=get_tenant(request).company_id), self)
 
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
+        return self.pagination_class().paginate_values(SaleValuesSerializer, queryset, request, view=self)
 
-        if start_date:
-            queryset = queryset.filter(sale_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(sale_date__lte=end_date)
 
-        serializer = SaleSerializer(queryset, many=True)
-        return Response(serializer.data)
+class SaleRetrieveAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+
+    @extend_schema(
+        tags=['sales'],
+        description="Получение продажи по ID",
+        parameters=FIELDSET_PARAMETERS
+    )
+    def get(self, request, pk):
+        fieldset = SaleValuesSerializer.get_fieldset(request)
+        sales = Sale.objects.filter(pk=pk, company_id=get_tenant(request).company_id)
+
+        updated_at = sales.values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return Response({"detail": "Продажа не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        not_modified = get_not_modified_response(request, pk, updated_at, fieldset)
+        if not_modified is not None:
+            return not_modified
+
+        row, data = SaleValuesSerializer.retrieve(sales, fieldset, extra=['updated_at'])
+        if row is None:
+            return Response({"detail": "Продажа не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        return set_version_headers(Response(data), pk, row['updated_at'], fieldset)
 
 
 class SaleUpdateAPIView(APIView):
@@ -566,7 +796,7 @@ class SaleUpdateAPIView(APIView):
         try:
             sale = Sale.objects.get(
                 id=pk,
-                company=request.user.company
+                company_id=get_tenant(request).company_id
             )
 
             serializer = self.serializer_class(
@@ -587,9 +817,12 @@ class SaleUpdateAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            sale.buyer_name = validated_data.get('buyer_name', sale.buyer_name)
-            sale.sale_date = validated_data.get('sale_date', sale.sale_date)
-            sale.save()
+            update_sale(
+                sale,
+                buyer_name=validated_data.get('buyer_name', sale.buyer_name),
+                sale_date=validated_data.get('sale_date', sale.sale_date)
+            )
+            invalidate_company_cache(sale.company_id)
 
             return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -611,9 +844,10 @@ class SaleDestroyAPIView(APIView):
         try:
             sale = Sale.objects.get(
                 id=pk,
-                company=request.user.company
+                company_id=get_tenant(request).company_id
             )
-            sale.delete()
+            delete_sale(sale)
+            invalidate_company_cache(sale.company_id)
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -622,3 +856,66 @@ class SaleDestroyAPIView(APIView):
                 {"detail": "Продажа не найдена"},
                 status=status.HTTP_404_NOT_FOUND
             )
+
+
+#################################REPORTS####################################
+
+
+class ProductStatsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+
+    @extend_schema(
+        tags=['reports'],
+        description="Продажи, поступления, выручка и маржа по товарам из дневной статистики",
+        parameters=[ProductStatsQuerySerializer]
+    )
+    def get(self, request):
+        query = ProductStatsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        stats = ProductDailyStats.objects.filter(company_id=get_tenant(request).company_id)
+        if 'start_date' in params:
+            stats = stats.filter(day__gte=params['start_date'])
+        if 'end_date' in params:
+            stats = stats.filter(day__lte=params['end_date'])
+        if 'product' in params:
+            stats = stats.filter(product_id=params['product'])
+
+        group_by = ['product_id', 'product__title']
+        if params['by'] == 'day':
+            group_by.append('day')
+
+        money = DecimalField(max_digits=14, decimal_places=2)
+        rows = stats.values(*group_by).annotate(
+            sold=Sum('units_sold'),
+            received=Sum('units_received'),
+            revenue=Sum(F('units_sold') * F('product__sale_price'), output_field=money),
+            cost=Sum(F('units_sold') * F('product__purchase_price'), output_field=money),
+        ).annotate(
+            margin=ExpressionWrapper(F('revenue') - F('cost'), output_field=money)
+        ).order_by(*group_by)
+
+        serializer = ProductStatsSerializer(rows, many=True)
+        return Response(serializer.data)
+
+
+class SalesAnalyticsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsRelatedToCompany]
+
+    @extend_schema(
+        tags=['reports'],
+        description="Выручка, количество, прибыль и топ товаров по продажам с разбивкой по дням, неделям или месяцам",
+        parameters=[SalesAnalyticsQuerySerializer],
+        responses=SalesAnalyticsSerializer
+    )
+    @cache_company_response
+    def get(self, request):
+        query = SalesAnalyticsQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        analytics = sales_analytics(get_tenant(request).company_id, **query.validated_data)
+        serializer = SalesAnalyticsSerializer(analytics)
+        return Response(serializer.data)
@@ -1,4 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from project.authentication import set_tenant_claims
 from .models import User
 
 
@@ -20,4 +25,21 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class AttachUserSerializer(serializers.Serializer):
-    email = serializers.EmailField()
\ No newline at end of file
+    email = serializers.EmailField()
+
+
+class CompanyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return set_tenant_claims(super().get_token(user), user)
+
+
+class CompanyTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        access = AccessToken(data['access'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}).first()
+        if user is not None:
+            data['access'] = str(set_tenant_claims(access, user))
+        return data
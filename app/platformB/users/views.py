@@ -5,7 +5,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from project.authentication import invalidate_tenant_claims
 from project.permissions import IsCompanyOwnerOrReadOnly
+from project.tenant import get_tenant
 
 from .models import User
 from .serializer import UserSerializer, AttachUserSerializer
@@ -25,7 +27,7 @@ class AttachUserToCompanyAPIView(APIView):
 
     def post(self, request):
         serializer = AttachUserSerializer(data=request.data)
-        user_company = request.user.company
+        user_company = get_tenant(request).company
         if not user_company:
             return Response(
                 {"detail": "У вас нет компании для прикрепления пользователей"},
@@ -51,6 +53,7 @@ class AttachUserToCompanyAPIView(APIView):
 
             user_to_attach.company = user_company
             user_to_attach.save()
+            invalidate_tenant_claims(user_to_attach.pk)
 
             return Response(
                 {"detail": "Пользователь успешно прикреплен к вашей компании"},